@@ -1,28 +1,136 @@
-def compute_alias_sets(functions):
-    alias_sets_by_canonical_name = {}
-    alias_sets_by_function = {}
-    for name in functions:
+# Alias sets of a collection of functions, maintained incrementally.
+#
+# Each function is added with the name of the function it aliases (or
+# None).  Its canonical name, found by following the alias chain, is
+# remembered for every function on the chain (path compression), so
+# each chain is only walked once no matter how many functions share it.
+#
+# Functions can also be removed (and added again, e.g. with a different
+# alias).  Removing a function dissolves the alias set its chain leads
+# to, and the set's other members are assigned again by the next call
+# to alias_sets(), so the result is always the same as computing the
+# alias sets of the current functions from scratch.
+import itertools
+import records
+
+
+class AliasSetIndex(object):
+    def __init__(self):
+        # Map from function name to the name it aliases (or None), in
+        # the order the functions were added.
+        self.aliases = {}
+        # Map from function name to a number giving the order in which
+        # the functions were added.
+        self.positions = {}
+        self.next_position = itertools.count()
+        # Functions not yet assigned to an alias set (as the keys of a
+        # dict, values unused).
+        self.unassigned = {}
+        # Map from function name to canonical name, for the functions
+        # whose alias chain has been followed.
+        self.canonical_names = {}
+        self.alias_sets_by_canonical_name = {}
+        self.alias_sets_by_function = {}
+
+    def add(self, name, alias):
+        if name in self.aliases:
+            raise Exception('Duplicate function: {0}'.format(name))
+        self.aliases[name] = alias
+        self.positions[name] = next(self.next_position)
+        self.unassigned[name] = None
+
+    def remove(self, name):
+        if name not in self.aliases:
+            raise Exception('No such function: {0}'.format(name))
+        del self.aliases[name]
+        del self.positions[name]
+        self.unassigned.pop(name, None)
+        canonical_name = self.canonical_names.pop(name, None)
+        if canonical_name is None:
+            # No alias chain that has been followed goes through name.
+            return
+        # Any function whose chain has been followed to canonical_name
+        # may have got there through name, so forget all of them: the
+        # members of the alias set, and any unassigned functions.
+        alias_set = self.alias_sets_by_canonical_name.pop(canonical_name,
+                                                          None)
+        if alias_set is not None:
+            for member in alias_set.functions:
+                del self.alias_sets_by_function[member]
+                self.canonical_names.pop(member, None)
+                if member != name:
+                    self.unassigned[member] = None
+        for other in self.unassigned:
+            if self.canonical_names.get(other) == canonical_name:
+                del self.canonical_names[other]
+
+    def canonical_name(self, name):
         names_seen = [name]
+        names_seen_set = set(names_seen)
         canonical_name = name
-        while True:
-            if canonical_name not in functions:
+        while canonical_name not in self.canonical_names:
+            if canonical_name not in self.aliases:
                 raise Exception(
                     'Alias chain terminates in non-function: {0}'.format(
                         ' -> '.join(names_seen)))
-            if functions[canonical_name]['alias'] is None:
+            if self.aliases[canonical_name] is None:
                 break
-            canonical_name = functions[canonical_name]['alias']
+            canonical_name = self.aliases[canonical_name]
             names_seen.append(canonical_name)
-            if canonical_name in names_seen[:-1]:
+            if canonical_name in names_seen_set:
                 raise Exception(
                     'Alias loop: {0}'.format(' -> '.join(names_seen)))
-        if canonical_name not in alias_sets_by_canonical_name:
-            alias_sets_by_canonical_name[canonical_name] = {
-                'canonical_name': canonical_name, 'functions': []}
-        alias_set = alias_sets_by_canonical_name[canonical_name]
-        alias_set['functions'].append(name)
-        alias_sets_by_function[name] = alias_set
-    alias_sets = [
-        alias_sets_by_canonical_name[canonical_name]
-        for canonical_name in sorted(alias_sets_by_canonical_name.keys())]
-    return alias_sets, alias_sets_by_function
+            names_seen_set.add(canonical_name)
+        canonical_name = self.canonical_names.get(canonical_name,
+                                                  canonical_name)
+        for name_seen in names_seen:
+            self.canonical_names[name_seen] = canonical_name
+        return canonical_name
+
+    # Subclasses may override new_alias_set() and add_to_alias_set() to
+    # maintain additional per-set data as functions join sets.
+    def new_alias_set(self, canonical_name):
+        alias_set = records.AliasSet()
+        alias_set.canonical_name = canonical_name
+        alias_set.functions = []
+        return alias_set
+
+    def add_to_alias_set(self, alias_set, name):
+        alias_set.functions.append(name)
+
+    # Return (alias_sets, alias_sets_by_function), as for
+    # compute_alias_sets(), covering every function added so far.
+    # Functions added since the last call (or whose set was dissolved
+    # by remove()) are added to the existing alias sets (or new ones);
+    # each set's functions are in the order they were added.  If this
+    # raises an exception, the functions it didn't get to are left for
+    # the next call.
+    def alias_sets(self):
+        for name in sorted(self.unassigned, key=self.positions.__getitem__):
+            canonical_name = self.canonical_name(name)
+            if canonical_name not in self.alias_sets_by_canonical_name:
+                self.alias_sets_by_canonical_name[canonical_name] = \
+                    self.new_alias_set(canonical_name)
+            alias_set = self.alias_sets_by_canonical_name[canonical_name]
+            self.add_to_alias_set(alias_set, name)
+            functions = alias_set.functions
+            if len(functions) > 1 and self.positions[functions[-2]] > \
+                    self.positions[name]:
+                # A function whose set was dissolved by remove() has
+                # joined a set with later functions in it; keep the
+                # functions in the order they were added.
+                functions.sort(key=self.positions.__getitem__)
+            self.alias_sets_by_function[name] = alias_set
+            del self.unassigned[name]
+        alias_sets = [
+            self.alias_sets_by_canonical_name[canonical_name]
+            for canonical_name in sorted(
+                self.alias_sets_by_canonical_name.keys())]
+        return alias_sets, dict(self.alias_sets_by_function)
+
+
+def compute_alias_sets(functions):
+    index = AliasSetIndex()
+    for name, function in functions.items():
+        index.add(name, function['alias'])
+    return index.alias_sets()
@@ -1,8 +1,12 @@
 import compare
 import mesa
+import mmap
 import os
 import os.path
+import parse_cache
 import re
+import registry
+import sys
 
 
 FUNCTION_START_REGEXP = re.compile(r'^(void )?(?P<name>[a-zA-Z0-9_]+)\(.*\)$')
@@ -11,26 +15,87 @@ FUNCTION_CALL_REGEXP = re.compile(r'^(?P<name>[a-zA-Z0-9_]+)\(.*\);$')
 SET_REGEXP = re.compile(r'^SET_(?P<glname>[a-zA-Z0-9_]+)\((exec|dest|table|disp), (?P<funcname>[a-zA-Z0-9_]+)\);')
 
 
-FUNCTIONS = {}
+# Byte strings, at least one of which appears in any C file defining a
+# function that is_function_of_interest() accepts.  Files containing
+# none of them are skipped without being decoded or scanned.  If
+# is_function_of_interest() changes, run with CHECK_PREFILTER set to
+# make sure this is still complete.
+PREFILTER_MARKERS = (b'_mesa_create_exec_table', b'_init_')
 
 
-def remove_comments(contents):
-    result_strings = []
+# OPENGL_API_EXEC_CHECK_PREFILTER=1 makes main() scan the files the
+# prefilter pruned as well, and raise an exception if any of them
+# defines a function of interest (i.e. if the prefiltered results would
+# differ from the unfiltered ones).
+CHECK_PREFILTER = os.environ.get('OPENGL_API_EXEC_CHECK_PREFILTER', '0') != '0'
+
+
+# main() prints how many C files it scanned and how many the
+# prefilter pruned to stderr, unless OPENGL_API_EXEC_STATS=0.
+REPORT_STATS = os.environ.get('OPENGL_API_EXEC_STATS', '1') != '0'
+
+
+# Tables loaded by main() the first time they are accessed (see
+# registry.py):
+#
+# FUNCTIONS: map from GL function name to a hash with key/value pairs:
+# - 'mesa_function': name of the Mesa function api_exec.c installs in
+#                    the dispatch table.
+# - 'condition': hash of 'desktop', 'deprecated', 'es1' and 'es2'
+#                annotations, in the same form as mesa.py's, describing
+#                the APIs for which the function is installed.
+#
+# DISPATCH_MATRIX: map from GL function name to a map from the name of
+# each API (see API_NAMES) for which api_exec.c installs the function
+# to the Mesa function it installs.
+TABLES = ['FUNCTIONS', 'DISPATCH_MATRIX']
+
+
+# Yield the lines of contents, with each comment replaced by a space
+# (so a comment spanning several lines joins them into one).  Only the
+# text between one comment and the next is split at a time.  An
+# unterminated comment runs to the end of contents rather than being
+# an error, so that e.g. a truncated file still yields the lines before
+# it.
+def uncommented_lines(contents):
+    pending = ''
     pos = 0
     while True:
         comment_start = contents.find('/*', pos)
         if comment_start == -1:
-            result_strings.append(contents[pos:])
-            break
-        result_strings.append(contents[pos:comment_start])
+            segment = contents[pos:]
+        else:
+            segment = contents[pos:comment_start]
+        lines = segment.split('\n')
+        if len(lines) > 1:
+            yield pending + lines[0]
+            for i in range(1, len(lines) - 1):
+                yield lines[i]
+            pending = lines[-1]
+        else:
+            pending += lines[0]
+        if comment_start == -1:
+            yield pending
+            return
         comment_end = contents.find('*/', comment_start + 2)
+        if comment_end == -1:
+            yield pending + ' '
+            return
+        pending += ' '
         pos = comment_end + 2
-    return ' '.join(result_strings)
 
 
-def kill_if_zeros(lines):
+# Yield the logical lines of the C source in contents: stripped,
+# non-empty, outside any "#if 0" block, and with a function call or
+# declaration that is split across lines joined into one.  This is a
+# single lazy pass over contents.
+def logical_lines(contents):
     killing = False
-    for line in lines:
+    continuation = None
+    for line in uncommented_lines(contents):
+        line = line.strip()
+        if not line:
+            continue
         if line == '#if 0':
             assert not killing
             killing = True
@@ -40,8 +105,16 @@ def kill_if_zeros(lines):
         if line == '#endif' and killing:
             killing = False
             continue
-        if not killing:
-            yield line
+        if killing:
+            continue
+        if continuation:
+            line = continuation + ' ' + line
+            continuation = None
+        if '(' in line and ')' not in line:
+            continuation = line
+            continue
+        yield line
+    assert continuation is None
 
 
 def is_function_of_interest(name):
@@ -58,37 +131,26 @@ def is_function_of_interest(name):
     return False
 
 
-def join_lines(lines):
-    continuation = None
-    for line in lines:
-        if continuation:
-            line = continuation + ' ' + line
-            continuation = None
-        if '(' in line and ')' not in line:
-            continuation = line
-            continue
-        yield line
-    assert continuation is None
-
-
+# Reads the logical lines of a C file (see logical_lines()) on demand,
+# with one line of lookahead.
 class Scanner(object):
     def __init__(self, contents):
-        lines = [line.strip()
-                 for line in remove_comments(contents).split('\n')]
-        lines = [line for line in lines if line]
-        lines = list(kill_if_zeros(lines))
-        self.lines = list(join_lines(lines))
-        self.i = 0
+        self.lines = logical_lines(contents)
+        self.next_line = next(self.lines, None)
 
     def lines_remain(self):
-        return self.i < len(self.lines)
+        return self.next_line is not None
 
     def peek_line(self):
-        return self.lines[self.i]
+        if self.next_line is None:
+            raise Exception('Unexpected end of file')
+        return self.next_line
 
     def get_line(self):
-        line = self.lines[self.i]
-        self.i += 1
+        line = self.next_line
+        if line is None:
+            raise Exception('Unexpected end of file')
+        self.next_line = next(self.lines, None)
         return line
 
     def process_statement(self):
@@ -147,6 +209,33 @@ class Scanner(object):
                     trees[name] = self.process_block_body()
 
 
+# Return True if the C file with the given name might define a function
+# of interest, i.e. contains one of PREFILTER_MARKERS.
+def may_define_functions_of_interest(filename):
+    with open(filename, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return False
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            return any(m.find(marker) != -1 for marker in PREFILTER_MARKERS)
+
+
+# Scan the C file with the given name, using the cache if possible.
+# Return a map from the name of each function of interest to the list
+# of nodes produced by Scanner.process_block_body() for its body.
+def scan_file(filename):
+    return parse_cache.cached(filename, 'api_exec',
+                              parse_cache.source_version(__file__),
+                              lambda: read_file(filename))
+
+
+# Same as scan_file(), but bypassing the cache.
+def read_file(filename):
+    trees = {}
+    with open(filename, 'r') as f:
+        Scanner(f.read()).process_file(trees)
+    return trees
+
+
 #def process_api_exec(f):
 #    default_condition = {'desktop': True, 'deprecated': None, 'es1': True, 'es2': '2.0'}
 #    condition = default_condition
@@ -206,78 +295,161 @@ class Scanner(object):
 #
 
 
-def filter_apis(apis, condition):
-    result = frozenset()
+# The APIs that api_exec.c distinguishes between.  A set of them is
+# represented as a bitmask, with bit i set for API_NAMES[i].
+API_NAMES = ('es1', 'es2', 'es3', 'core', 'compat')
+API_BITS = dict((api, 1 << i) for i, api in enumerate(API_NAMES))
+ALL_APIS = (1 << len(API_NAMES)) - 1
+ES1 = API_BITS['es1']
+ES2 = API_BITS['es2']
+ES3 = API_BITS['es3']
+CORE = API_BITS['core']
+COMPAT = API_BITS['compat']
+
+
+# Map from each term that may appear in an if condition in api_exec.c
+# to the set of APIs for which it is true.
+CONDITION_TERMS = {
+    'ctx->API != API_OPENGL_CORE': ALL_APIS & ~CORE,
+    'ctx->API != API_OPENGLES2': ALL_APIS & ~(ES2 | ES3),
+    'ctx->API != API_OPENGLES': ALL_APIS & ~ES1,
+    'ctx->API == API_OPENGL': COMPAT,
+    'ctx->API == API_OPENGL_CORE': CORE,
+    'ctx->API == API_OPENGLES': ES1,
+    'ctx->API == API_OPENGLES2': ES2 | ES3,
+    '_mesa_is_gles3(ctx)': ES3,
+    '_mesa_is_desktop_gl(ctx)': CORE | COMPAT,
+    }
+
+
+# Map from the text of an if condition to the set of APIs for which it
+# is true, filled in by condition_mask().
+CONDITION_MASKS = {}
+
+
+# Return the set of APIs for which condition (a '||' of '&&'s of
+# CONDITION_TERMS) is true.
+def condition_mask(condition):
+    if condition in CONDITION_MASKS:
+        return CONDITION_MASKS[condition]
+    mask = 0
     for part in condition.split('||'):
         part = part.strip()
-        sub_apis = apis
+        part_mask = ALL_APIS
         for sub_part in part.split('&&'):
             sub_part = sub_part.strip()
-            if sub_part == 'ctx->API != API_OPENGL_CORE':
-                sub_apis -= frozenset(['core'])
-            elif sub_part == 'ctx->API != API_OPENGLES2':
-                sub_apis -= frozenset(['es2', 'es3'])
-            elif sub_part == 'ctx->API != API_OPENGLES':
-                sub_apis -= frozenset(['es1'])
-            elif sub_part == 'ctx->API == API_OPENGL':
-                sub_apis &= frozenset(['compat'])
-            elif sub_part == 'ctx->API == API_OPENGL_CORE':
-                sub_apis &= frozenset(['core'])
-            elif sub_part == 'ctx->API == API_OPENGLES':
-                sub_apis &= frozenset(['es1'])
-            elif sub_part == 'ctx->API == API_OPENGLES2':
-                sub_apis &= frozenset(['es2', 'es3'])
-            elif sub_part == '_mesa_is_gles3(ctx)':
-                sub_apis &= frozenset(['es3'])
-            elif sub_part == '_mesa_is_desktop_gl(ctx)':
-                sub_apis &= frozenset(['core', 'compat'])
-            else:
+            if sub_part not in CONDITION_TERMS:
                 raise Exception(part)
-        result |= sub_apis
-    return result
-
-
-def interpret_trees(trees, func, apis, analysis):
-    def recurse(nodes, apis):
-        for node in nodes:
-            if node[0] == 'if':
-                if not node[2]:
-                    continue
-                recurse(node[2], filter_apis(apis, node[1]))
-            elif node[0] == 'call':
-                interpret_trees(trees, node[1], apis, analysis)
-            elif node[0] == 'set':
-                analysis.append((apis, node[1], node[2]))
-            else:
-                raise Exception(node[0])
-    recurse(trees[func], apis)
+            part_mask &= CONDITION_TERMS[sub_part]
+        mask |= part_mask
+    CONDITION_MASKS[condition] = mask
+    return mask
+
+
+# Return the subset of apis for which condition is true.
+def filter_apis(apis, condition):
+    return apis & condition_mask(condition)
+
+
+# Append to analysis an entry (apis, glname, funcname) for each SET_*
+# statement reached by calling func with the given set of apis (a
+# bitmask; see API_NAMES), where apis is narrowed by the enclosing if
+# statements.  trees is as returned by scan_file().
+#
+# The call graph is walked iteratively, with one frame per function
+# being interpreted.  The entries each (function, apis) pair produces
+# are remembered in memo, so a helper called from several places is
+# only walked once per set of apis.  A cycle of calls raises an
+# exception naming the functions involved.
+def interpret_trees(trees, func, apis, analysis, memo=None):
+    if memo is None:
+        memo = {}
+    # Each frame is [func, apis, entries, pending], where pending is a
+    # stack of (iterator over nodes, apis) for the bodies of the
+    # function and the if statements being interpreted.  on_stack is the
+    # set of functions in frames, so that cycles are found without
+    # walking the frames.
+    frames = []
+    on_stack = set()
+    def call(func, apis):
+        if (func, apis) in memo:
+            return memo[func, apis]
+        if func in on_stack:
+            calling = [frame[0] for frame in frames]
+            raise Exception('Cycle of calls: {0}'.format(' -> '.join(
+                        calling[calling.index(func):] + [func])))
+        frames.append([func, apis, [], [(iter(trees[func]), apis)]])
+        on_stack.add(func)
+        return None
+    root = (func, apis)
+    call(func, apis)
+    while frames:
+        func, apis, entries, pending = frames[-1]
+        if not pending:
+            frames.pop()
+            on_stack.remove(func)
+            memo[func, apis] = entries
+            if frames:
+                frames[-1][2].extend(entries)
+            continue
+        nodes, node_apis = pending[-1]
+        node = next(nodes, None)
+        if node is None:
+            pending.pop()
+        elif node[0] == 'if':
+            if node[2]:
+                pending.append((iter(node[2]), filter_apis(node_apis, node[1])))
+        elif node[0] == 'call':
+            callee_entries = call(node[1], node_apis)
+            if callee_entries is not None:
+                entries.extend(callee_entries)
+        elif node[0] == 'set':
+            entries.append((node_apis, node[1], node[2]))
+        else:
+            raise Exception(node[0])
+    analysis.extend(memo[root])
 
 
 def main():
-    src_dir = '/home/pberry/mesa/src/mesa/main'
+    global FUNCTIONS, DISPATCH_MATRIX
+    FUNCTIONS = {}
+    src_dir = os.path.join(registry.MESA_DIR, 'src', 'mesa', 'main')
     src_files = [file for file in os.listdir(src_dir) if file.endswith('.c')]
     trees = {}
+    pruned = 0
     for file in src_files:
-        with open(os.path.join(src_dir, file), 'r') as f:
-            Scanner(f.read()).process_file(trees)
+        path = os.path.join(src_dir, file)
+        if not may_define_functions_of_interest(path):
+            pruned += 1
+            if CHECK_PREFILTER:
+                missed = read_file(path)
+                if missed:
+                    raise Exception(
+                        'Prefilter pruned {0}, which defines {1}; '
+                        'PREFILTER_MARKERS is incomplete'.format(
+                            path, ', '.join(sorted(missed))))
+            continue
+        trees.update(scan_file(path))
+    if REPORT_STATS:
+        print('api_exec: scanned {0} of {1} C files ({2} pruned)'.format(
+                len(src_files) - pruned, len(src_files), pruned),
+              file=sys.stderr)
     analysis = []
-    interpret_trees(trees, '_mesa_create_exec_table',
-                    frozenset(['es1', 'es2', 'es3', 'core', 'compat']),
-                    analysis)
+    interpret_trees(trees, '_mesa_create_exec_table', ALL_APIS, analysis)
     for entry in analysis:
         apis = entry[0]
-        if 'core' in apis:
-            assert 'compat' in apis
-        desktop = 'compat' in apis
-        if 'compat' in apis and not 'core' in apis:
+        if apis & CORE:
+            assert apis & COMPAT
+        desktop = bool(apis & COMPAT)
+        if apis & COMPAT and not apis & CORE:
             deprecated = '3.1'
         else:
             deprecated = None
-        es1 = 'es1' in apis
-        if 'es2' in apis:
-            assert 'es3' in apis
+        es1 = bool(apis & ES1)
+        if apis & ES2:
+            assert apis & ES3
             es2 = '2.0'
-        elif 'es3' in apis:
+        elif apis & ES3:
             es2 = '3.0'
         else:
             es2 = None
@@ -286,13 +458,36 @@ def main():
         funcname = entry[2]
         assert glname not in FUNCTIONS
         FUNCTIONS[glname] = {'mesa_function': funcname, 'condition': annotations}
+    DISPATCH_MATRIX = build_dispatch_matrix(analysis)
+
+
+# Return a map from GL function name to a map from each API name (see
+# API_NAMES) for which the function is installed to the Mesa function
+# installed, given the analysis produced by interpret_trees().
+def build_dispatch_matrix(analysis):
+    matrix = {}
+    for apis, glname, funcname in analysis:
+        row = matrix.setdefault(glname, {})
+        for api in API_NAMES:
+            if apis & API_BITS[api]:
+                if row.get(api, funcname) != funcname:
+                    raise Exception(
+                        '{0} is dispatched to both {1} and {2} in {3}'.format(
+                            glname, row[api], funcname, api))
+                row[api] = funcname
+    return matrix
 
+
+# Yield the differences between FUNCTIONS and mesa's XML, as
+# compare.py diff records.
+def xml_diffs():
     xml_keys = set(alias_set['canonical_name']
                    for alias_set in mesa.ALIAS_SETS
                    if alias_set['exec'] not in ('skip', 'dynamic'))
     exec_keys = set(FUNCTIONS.keys())
-    compare.diff_keys(xml_keys, exec_keys, 'XML', 'api_exec.c', 'functions')
-    compare.diff_keys(exec_keys, xml_keys, 'api_exec.c', 'XML', 'functions')
+    for record in compare.key_diffs(xml_keys, exec_keys, 'XML', 'api_exec.c',
+                                    'functions'):
+        yield record
     common_keys = xml_keys & exec_keys
     for name in sorted(common_keys):
         mesa_alias_set = mesa.ALIAS_SETS_BY_FUNCTION[name]
@@ -309,8 +504,9 @@ def main():
         else:
             raise Exception('Function {0} has unexpected exec flavour {1!r}'.format(name, exec_flavour))
         if FUNCTIONS[name]['mesa_function'] != xml_mesa_function:
-            print('{0}: XML says mesa function is {1!r}, but api_exec.c says it\'s {2!r}'.format(
-                    name, xml_mesa_function, FUNCTIONS[name]['mesa_function']))
+            yield compare.FieldMismatch(
+                'function', name, 'mesa function', 'XML', xml_mesa_function,
+                'api_exec.c', FUNCTIONS[name]['mesa_function'])
         condition = FUNCTIONS[name]['condition']
         for key in ('deprecated', 'es1', 'es2', 'desktop'):
             mesa_value = mesa_alias_set[key]
@@ -318,9 +514,18 @@ def main():
                 mesa_value = (mesa_value is not None)
             api_exec_value = condition[key]
             if mesa_value != api_exec_value:
-                print('{0}: XML says {1} is {2!r}, but api_exec.c says it\'s {3!r}'.format(
-                        name, key, mesa_value, api_exec_value))
+                yield compare.FieldMismatch(
+                    'function', name, key, 'XML', mesa_value, 'api_exec.c',
+                    api_exec_value)
 
     # TODO: warn if multiple non-aliased functions dispatch to the same Mesa function.
 
-main()
+
+__getattr__ = registry.lazy_tables(__name__, main, TABLES)
+
+
+if __name__ == '__main__':
+    main()
+    sink = compare.make_sink()
+    compare.emit(xml_diffs(), sink)
+    sink.close()
@@ -0,0 +1,101 @@
+# Sets of function names represented as bitsets.
+#
+# FUNCTION_NAMES gives each function name a dense integer ID the first
+# time it is seen.  It is shared by all the loaders, so a given name
+# has the same ID whichever table it came from.  A set of functions is
+# then a Python int with bit i set iff the function with ID i is in
+# the set, and unions, intersections and differences of such sets
+# (even across hundreds of extensions) are just |, & and & ~ on whole
+# machine words.
+
+
+# BYTE_BITS[b] is a tuple of the positions of the bits set in the byte
+# b, lowest first.
+BYTE_BITS = [tuple(i for i in range(8) if byte & (1 << i))
+             for byte in range(256)]
+
+
+class Interner(object):
+    def __init__(self):
+        # Map from name to ID.
+        self.ids = {}
+        # Map from ID to name.
+        self.names = []
+
+    def intern(self, name):
+        """Return the ID of name, assigning it a new one if necessary."""
+        id = self.ids.get(name)
+        if id is None:
+            id = len(self.names)
+            self.ids[name] = id
+            self.names.append(name)
+        return id
+
+    def bitset(self, names):
+        """Return the bitset containing the given names."""
+        # Setting one bit at a time (bits |= 1 << id) would copy the
+        # whole int for each name; instead set the bits in a bytearray
+        # and convert it once.
+        ids = [self.intern(name) for name in names]
+        if not ids:
+            return 0
+        data = bytearray(max(ids) // 8 + 1)
+        for id in ids:
+            data[id >> 3] |= 1 << (id & 7)
+        return int.from_bytes(data, 'little')
+
+    def names_in(self, bits):
+        """Return a list of the names in the given bitset, in ID order."""
+        names = []
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        for byte_index, byte in enumerate(data):
+            if byte:
+                base = byte_index * 8
+                for offset in BYTE_BITS[byte]:
+                    names.append(self.names[base + offset])
+        return names
+
+    def contains(self, bits, name):
+        """Return True iff name is in the given bitset."""
+        id = self.ids.get(name)
+        return id is not None and (bits >> id) & 1 == 1
+
+
+FUNCTION_NAMES = Interner()
+
+
+def bitsets_by_key(rel, interner=FUNCTION_NAMES):
+    """Convert a map from X to a list of names (such as a
+    FUNCTIONS_BY_EXTENSION table) into a map from X to a bitset.
+    """
+    return dict((key, interner.bitset(values)) for key, values in rel.items())
+
+
+def keys_containing(bitsets, name, interner=FUNCTION_NAMES):
+    """Return a sorted list of the keys of bitsets whose bitset contains
+    name (e.g. the extensions that provide a function).
+    """
+    id = interner.ids.get(name)
+    if id is None:
+        return []
+    bit = 1 << id
+    return sorted(key for key, bits in bitsets.items() if bits & bit)
+
+
+def union(bitsets, keys):
+    """Return the union of the bitsets for the given keys."""
+    result = 0
+    for key in keys:
+        result |= bitsets[key]
+    return result
+
+
+def intersection(bitsets, keys):
+    """Return the intersection of the bitsets for the given keys."""
+    keys = list(keys)
+    if not keys:
+        raise Exception('Intersection of no bitsets')
+    result = bitsets[keys[0]]
+    for key in keys[1:]:
+        result &= bitsets[key]
+    return result
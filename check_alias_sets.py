@@ -0,0 +1,90 @@
+# Randomized check of alias_sets.AliasSetIndex: applies random adds,
+# removes and re-adds of functions, and checks after each one that the
+# incrementally maintained alias sets are the same as those computed
+# from scratch.
+
+import alias_sets
+import random
+import sys
+
+
+# The straightforward version of alias_sets.compute_alias_sets(),
+# walking every function's alias chain in full.
+# aliases maps each function name to the name it aliases (or None).
+# Return a sorted list of (canonical_name, functions) pairs.
+def reference_alias_sets(aliases):
+    functions_by_canonical_name = {}
+    for name in aliases:
+        names_seen = [name]
+        canonical_name = name
+        while True:
+            if canonical_name not in aliases:
+                raise Exception(
+                    'Alias chain terminates in non-function: {0}'.format(
+                        ' -> '.join(names_seen)))
+            if aliases[canonical_name] is None:
+                break
+            canonical_name = aliases[canonical_name]
+            names_seen.append(canonical_name)
+            if canonical_name in names_seen[:-1]:
+                raise Exception(
+                    'Alias loop: {0}'.format(' -> '.join(names_seen)))
+        functions_by_canonical_name.setdefault(canonical_name, []).append(name)
+    return sorted(functions_by_canonical_name.items())
+
+
+# Apply steps random adds, removes and re-adds of functions to an
+# AliasSetIndex, checking after each one that alias_sets() agrees with
+# reference_alias_sets() (including on whether it raises an exception).
+def check_against_reference(seed, steps):
+    rng = random.Random(seed)
+    names = ['f{0}'.format(i) for i in range(rng.randint(1, 30))]
+    index = alias_sets.AliasSetIndex()
+    aliases = {}
+    for step in range(steps):
+        name = rng.choice(names)
+        if name in aliases and rng.random() < 0.5:
+            index.remove(name)
+            del aliases[name]
+        else:
+            if name in aliases:
+                index.remove(name)
+                del aliases[name]
+            # Mostly alias functions that exist, but sometimes ones that
+            # don't (or loops), so that the error paths get exercised.
+            existing = list(aliases)
+            if existing and rng.random() < 0.6:
+                alias = rng.choice(existing)
+            elif rng.random() < 0.2:
+                alias = rng.choice(names)
+            else:
+                alias = None
+            index.add(name, alias)
+            aliases[name] = alias
+        try:
+            expected = reference_alias_sets(aliases)
+        except Exception:
+            expected = None
+        try:
+            sets, sets_by_function = index.alias_sets()
+        except Exception:
+            actual = None
+        else:
+            actual = [(alias_set.canonical_name, alias_set.functions)
+                      for alias_set in sets]
+            assert sorted(sets_by_function) == sorted(aliases)
+            for alias_set in sets:
+                for name in alias_set.functions:
+                    assert sets_by_function[name] is alias_set
+        if actual != expected:
+            raise Exception(
+                'Seed {0}, step {1}: expected {2!r}, got {3!r}'.format(
+                    seed, step, expected, actual))
+
+
+# Usage: check_alias_sets.py [TRIALS]
+if __name__ == '__main__':
+    trials = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    for seed in range(trials):
+        check_against_reference(seed, 200)
+    print('{0} random trials agree with the reference'.format(trials))
@@ -1,24 +1,290 @@
-def diff_keys(a_keys, b_keys, a_name, b_name, entities_name,
-              key_printer = None):
-    key_diff = a_keys - b_keys
-    if key_diff:
-        print('{0} in {1} but not {2}:'.format(entities_name, a_name, b_name))
-        if key_printer is not None:
-            key_diff = [key_printer(key) for key in key_diff]
-        for key in sorted(key_diff):
-            print('  {0}'.format(key))
+# Diffs between the tables of two sources (e.g. mesa.py and opengl.py).
+#
+# The *_diffs() functions are generators yielding one diff record
+# (ExtraKey, MissingKey, FieldMismatch or AliasSetMismatch) per
+# difference, as they are found.  emit() sends records to a sink,
+# which decides what to do with them:
+# - TextSink prints them as human-readable text.
+# - JsonLinesSink writes one JSON object per record, for tools to
+#   ingest.
+# - CountingSink formats nothing, and just prints the number of
+#   records of each kind when it is closed.
+# A script creates its sink (usually with make_sink()), emits to it,
+# and closes it when done.
+#
+# diff_keys() and diff_functions_by_extension() are the older
+# interface, which prints text directly; they are kept for existing
+# callers.
+#
+# Configuration (environment variable, or assign to the global before
+# calling make_sink()):
+# - OPENGL_API_DIFF_FORMAT selects the sink make_sink() creates by
+#   default: 'text' (the default), 'jsonl' or 'count' (FORMAT).
 
+import bitsets
+import collections
+import json
+import os
+import sys
 
-def diff_functions_by_extension(a_map, b_map, a_name, b_name):
+
+FORMAT = os.environ.get('OPENGL_API_DIFF_FORMAT', 'text')
+
+
+class DiffRecord(object):
+    """Base class for diff records.  Subclasses set KIND (the record's
+    name in JSON output) and __slots__ (its fields, in the order the
+    constructor takes them).
+    """
+    __slots__ = ()
+
+    def __init__(self, *values):
+        if len(values) != len(self.__slots__):
+            raise Exception('{0} takes {1} values, not {2}'.format(
+                    type(self).__name__, len(self.__slots__), len(values)))
+        for field, value in zip(self.__slots__, values):
+            setattr(self, field, value)
+
+    def as_dict(self):
+        result = {'kind': self.KIND}
+        for field in self.__slots__:
+            value = getattr(self, field)
+            if isinstance(value, frozenset):
+                value = sorted(value)
+            result[field] = value
+        return result
+
+    # Return the heading that this record is listed under in text
+    # output (consecutive records with the same heading share it), or
+    # None.
+    def text_heading(self):
+        return None
+
+    # Return the lines of text output for this record.  Subclasses
+    # override this with something more readable.
+    def text_lines(self):
+        return ['{0}: {1}'.format(self.KIND, ', '.join(
+                    '{0}={1!r}'.format(field, value)
+                    for field, value in sorted(self.as_dict().items())
+                    if field != 'kind'))]
+
+    def __repr__(self):
+        return '{0}({1})'.format(type(self).__name__, ', '.join(
+                repr(getattr(self, field)) for field in self.__slots__))
+
+
+class ExtraKey(DiffRecord):
+    """key (one of the entities, e.g. 'functions') is in source a but
+    not source b.
+    """
+    KIND = 'extra_key'
+    __slots__ = ('entities', 'key', 'a_name', 'b_name')
+
+    def text_heading(self):
+        return '{0} in {1} but not {2}:'.format(
+            self.entities, self.a_name, self.b_name)
+
+    def text_lines(self):
+        return ['  {0}'.format(self.key)]
+
+
+class MissingKey(DiffRecord):
+    """key (one of the entities, e.g. 'functions') is in source b but
+    missing from source a.
+    """
+    KIND = 'missing_key'
+    __slots__ = ('entities', 'key', 'a_name', 'b_name')
+
+    def text_heading(self):
+        return '{0} in {1} but not {2}:'.format(
+            self.entities, self.b_name, self.a_name)
+
+    def text_lines(self):
+        return ['  {0}'.format(self.key)]
+
+
+class FieldMismatch(DiffRecord):
+    """The entity (e.g. 'function') called key has a_value for field in
+    source a, but b_value in source b.  A field of None means the
+    entity as a whole; the values are then summaries of it.
+    """
+    KIND = 'field_mismatch'
+    __slots__ = ('entity', 'key', 'field', 'a_name', 'a_value', 'b_name',
+                 'b_value')
+
+    def text_lines(self):
+        if self.field is None:
+            return ['{0} {1} does not match:'.format(
+                    self.entity.capitalize(), self.key),
+                    '  {0}: {1}'.format(self.a_name, self.a_value),
+                    '  {0}: {1}'.format(self.b_name, self.b_value)]
+        return ['{0}: {1} says {2} is {3!r}, but {4} says it\'s {5!r}'.format(
+                self.key, self.a_name, self.field, self.a_value, self.b_name,
+                self.b_value)]
+
+
+class AliasSetMismatch(DiffRecord):
+    """The alias set containing exactly functions (a frozenset) is in
+    the source present_in but not missing_from.
+    """
+    KIND = 'alias_set_mismatch'
+    __slots__ = ('functions', 'present_in', 'missing_from')
+
+    def text_heading(self):
+        return 'alias sets in {0} but not {1}:'.format(
+            self.present_in, self.missing_from)
+
+    def text_lines(self):
+        return ['  {0}'.format(alias_set_text(self.functions))]
+
+
+def alias_set_text(functions):
+    return '({0})'.format(', '.join(sorted(functions)))
+
+
+class TextSink(object):
+    def __init__(self, file=None):
+        # None means whatever sys.stdout is at the time.
+        self.file = file
+        self.heading = None
+
+    def write(self, record):
+        file = self.file or sys.stdout
+        heading = record.text_heading()
+        if heading is not None and heading != self.heading:
+            print(heading, file=file)
+        self.heading = heading
+        for line in record.text_lines():
+            print(line, file=file)
+
+    def close(self):
+        pass
+
+
+class JsonLinesSink(object):
+    def __init__(self, file=None):
+        self.file = file
+
+    def write(self, record):
+        file = self.file or sys.stdout
+        file.write(json.dumps(record.as_dict(), sort_keys=True))
+        file.write('\n')
+
+    def close(self):
+        pass
+
+
+class CountingSink(object):
+    def __init__(self, file=None):
+        self.file = file
+        self.counts = collections.Counter()
+
+    def write(self, record):
+        self.counts[record.KIND] += 1
+
+    def close(self):
+        file = self.file or sys.stdout
+        for kind in sorted(self.counts):
+            print('{0}: {1}'.format(kind, self.counts[kind]), file=file)
+
+
+SINK_CLASSES = {
+    'text': TextSink,
+    'jsonl': JsonLinesSink,
+    'count': CountingSink,
+    }
+
+
+def make_sink(format=None, file=None):
+    """Return a new sink for the given format (one of SINK_CLASSES; by
+    default FORMAT), writing to file (by default, sys.stdout).
+    """
+    if format is None:
+        format = FORMAT
+    if format not in SINK_CLASSES:
+        raise Exception('Unknown diff format {0!r} (expected one of {1})'
+                        .format(format, ', '.join(sorted(SINK_CLASSES))))
+    return SINK_CLASSES[format](file)
+
+
+def emit(records, sink):
+    """Send each of the diff records to sink."""
+    for record in records:
+        sink.write(record)
+
+
+def key_diffs(a_keys, b_keys, a_name, b_name, entities_name):
+    """Yield an ExtraKey for each key in the set a_keys but not b_keys,
+    then a MissingKey for each key in b_keys but not a_keys.
+    """
+    for key in sorted(a_keys - b_keys):
+        yield ExtraKey(entities_name, key, a_name, b_name)
+    for key in sorted(b_keys - a_keys):
+        yield MissingKey(entities_name, key, a_name, b_name)
+
+
+def functions_by_extension_diffs(a_map, b_map, a_name, b_name):
+    """Yield the differences between two FUNCTIONS_BY_EXTENSION tables
+    (maps from extension name to a list of function names): first the
+    extensions only one of them has, then the functions only one of
+    them has for each common extension.
+    """
+    return function_bitsets_by_extension_diffs(
+        bitsets.bitsets_by_key(a_map), bitsets.bitsets_by_key(b_map),
+        a_name, b_name)
+
+
+def function_bitsets_by_extension_diffs(a_map, b_map, a_name, b_name):
+    """Same as functions_by_extension_diffs(), but for two
+    FUNCTION_BITSETS_BY_EXTENSION tables (see bitsets.py), which is
+    quicker when they're already loaded.
+    """
     a_exts = set(a_map.keys())
     b_exts = set(b_map.keys())
-    diff_keys(a_exts, b_exts, a_name, b_name, 'extensions')
-    diff_keys(b_exts, a_exts, b_name, a_name, 'extensions')
-    common_exts = a_exts & b_exts
-    for ext in sorted(common_exts):
-        a_funcs = set(a_map[ext])
-        b_funcs = set(b_map[ext])
-        diff_keys(a_funcs, b_funcs, a_name, b_name,
-                  '{0} functions'.format(ext))
-        diff_keys(b_funcs, a_funcs, b_name, a_name,
-                  '{0} functions'.format(ext))
+    for record in key_diffs(a_exts, b_exts, a_name, b_name, 'extensions'):
+        yield record
+    for ext in sorted(a_exts & b_exts):
+        a_funcs = a_map[ext]
+        b_funcs = b_map[ext]
+        if a_funcs == b_funcs:
+            continue
+        # Only decode the functions that differ.
+        a_only = set(bitsets.FUNCTION_NAMES.names_in(a_funcs & ~b_funcs))
+        b_only = set(bitsets.FUNCTION_NAMES.names_in(b_funcs & ~a_funcs))
+        for record in key_diffs(a_only, b_only, a_name, b_name,
+                                '{0} functions'.format(ext)):
+            yield record
+
+
+def diff_keys(a_keys, b_keys, a_name, b_name, entities_name,
+              key_printer=None):
+    """Print the keys in the set a_keys but not b_keys as text (each
+    passed through key_printer, if given).  New code should emit
+    key_diffs() instead.
+    """
+    keys = a_keys - b_keys
+    if key_printer is not None:
+        keys = [key_printer(key) for key in keys]
+    emit((ExtraKey(entities_name, key, a_name, b_name)
+          for key in sorted(keys)), TextSink())
+
+
+def diff_functions_by_extension(a_map, b_map, a_name, b_name):
+    """Print the differences between two FUNCTIONS_BY_EXTENSION tables
+    as text.  New code should emit functions_by_extension_diffs()
+    instead.
+    """
+    emit(functions_by_extension_diffs(a_map, b_map, a_name, b_name),
+         TextSink())
+
+
+def alias_set_diffs(a_sets, b_sets, a_name, b_name):
+    """Yield an AliasSetMismatch for each alias set (a frozenset of
+    function names) in one of the sets a_sets and b_sets but not the
+    other.
+    """
+    for present, absent, present_name, absent_name in (
+            (a_sets, b_sets, a_name, b_name),
+            (b_sets, a_sets, b_name, a_name)):
+        for functions in sorted(present - absent, key=alias_set_text):
+            yield AliasSetMismatch(functions, present_name, absent_name)
@@ -3,52 +3,6 @@ import mesa
 import opengl
 
 
-TYPE_EQUIVALENCES = {
-    'GLclampf': 'GLfloat',
-    'GLchar': 'char',
-    'GLcharARB': 'char',
-    'GLsizei': 'GLint',
-    'GLclampd': 'GLdouble',
-    'GLhandleARB': 'GLuint',
-    'GLbitfield': 'GLenum',
-    'GLvoid': 'void',
-    }
-
-
-def normalize_mesa_function(func):
-    return {
-        'return': normalize_type(func['return']),
-        'params': [normalize_mesa_param(p) for p in func['params']],
-        'deprecated': func['deprecated']
-        }
-
-
-def normalize_mesa_param(param):
-    return {
-        'type': normalize_type(param['type'])
-        }
-
-
-def normalize_opengl_function(func):
-    return {
-        'return': normalize_type(func['return']),
-        'params': [normalize_opengl_param(p) for p in func['params']],
-        'deprecated': func['deprecated']
-        }
-
-
-def normalize_opengl_param(param):
-    return {
-        'type': normalize_type(param['type'])
-        }
-
-
-def normalize_type(type):
-    type_parts = type.replace('*', ' * ').split()
-    type_parts = [TYPE_EQUIVALENCES.get(p, p) for p in type_parts]
-    return ' '.join(type_parts)
-
-
 def summarize_function(name, func):
     if func['deprecated']:
         deprecation_string = ' /* deprecated in GL {0} */'.format(
@@ -75,45 +29,51 @@ def process_alias_sets(alias_sets, functions_to_keep):
     return result
 
 
-def alias_set_printer(alias_set):
-    return '({0})'.format(', '.join(sorted(alias_set)))
-
-
-mesa_keys = set(mesa.FUNCTIONS.keys())
-opengl_keys = set(opengl.FUNCTIONS.keys())
-compare.diff_keys(mesa_keys, opengl_keys, 'mesa', 'opengl', 'functions')
-compare.diff_keys(opengl_keys, mesa_keys, 'opengl', 'mesa', 'functions')
-common_keys = mesa_keys & opengl_keys
-for key in sorted(common_keys):
-    mesa_func = normalize_mesa_function(mesa.FUNCTIONS[key])
-    opengl_func = normalize_opengl_function(opengl.FUNCTIONS[key])
-    # TODO: temporary HACK: ignore deprecation for extension functions
-    if not opengl.FUNCTIONS[key]['category'].startswith('VERSION_'):
-        mesa_func['deprecated'] = None
-        opengl_func['deprecated'] = None
-    if mesa_func != opengl_func:
-        print('Function {0} does not match:'.format(key))
-        print('  mesa: {0}'.format(
-                summarize_function(key, mesa.FUNCTIONS[key])))
-        print('  opengl: {0}'.format(
-                summarize_function(key, opengl.FUNCTIONS[key])))
-compare.diff_functions_by_extension(
-    mesa.FUNCTIONS_BY_EXTENSION, opengl.FUNCTIONS_BY_EXTENSION,
-    'mesa', 'opengl')
-
-# To compare alias sets we first eliminate any functions from the
-# alias sets that aren't known to both opengl and mesa, and reorganize
-# into maps from (frozenset of function names) to the original alias
-# set.
-#
-# NOTE: we don't care if mesa and opengl differ in which function they
-# call canonical.  Also, to reduce the volume of output, we don't
-# print out alias sets that contain just a single function.
-mesa_alias_sets = process_alias_sets(mesa.ALIAS_SETS, common_keys)
-opengl_alias_sets = process_alias_sets(opengl.ALIAS_SETS, common_keys)
-mesa_alias_keys = frozenset(mesa_alias_sets.keys())
-opengl_alias_sets = frozenset(opengl_alias_sets.keys())
-compare.diff_keys(mesa_alias_keys, opengl_alias_sets, 'mesa', 'opengl',
-                  'alias sets', alias_set_printer)
-compare.diff_keys(opengl_alias_sets, mesa_alias_keys, 'opengl', 'mesa',
-                  'alias sets', alias_set_printer)
+def function_diffs(common_keys):
+    for key in sorted(common_keys):
+        mismatch = mesa.SIGNATURES[key] is not opengl.SIGNATURES[key]
+        # TODO: temporary HACK: ignore deprecation for extension functions
+        if not mismatch and \
+                opengl.FUNCTIONS[key]['category'].startswith('VERSION_'):
+            mismatch = mesa.FUNCTIONS[key]['deprecated'] != \
+                opengl.FUNCTIONS[key]['deprecated']
+        if mismatch:
+            yield compare.FieldMismatch(
+                'function', key, None,
+                'mesa', summarize_function(key, mesa.FUNCTIONS[key]),
+                'opengl', summarize_function(key, opengl.FUNCTIONS[key]))
+
+
+def diffs():
+    mesa_keys = set(mesa.FUNCTIONS.keys())
+    opengl_keys = set(opengl.FUNCTIONS.keys())
+    for record in compare.key_diffs(mesa_keys, opengl_keys, 'mesa', 'opengl',
+                                    'functions'):
+        yield record
+    common_keys = mesa_keys & opengl_keys
+    for record in function_diffs(common_keys):
+        yield record
+    for record in compare.function_bitsets_by_extension_diffs(
+            mesa.FUNCTION_BITSETS_BY_EXTENSION,
+            opengl.FUNCTION_BITSETS_BY_EXTENSION, 'mesa', 'opengl'):
+        yield record
+
+    # To compare alias sets we first eliminate any functions from the
+    # alias sets that aren't known to both opengl and mesa, and
+    # reorganize into maps from (frozenset of function names) to the
+    # original alias set.
+    #
+    # NOTE: we don't care if mesa and opengl differ in which function
+    # they call canonical.  Also, to reduce the volume of output, we
+    # don't print out alias sets that contain just a single function.
+    mesa_alias_sets = process_alias_sets(mesa.ALIAS_SETS, common_keys)
+    opengl_alias_sets = process_alias_sets(opengl.ALIAS_SETS, common_keys)
+    for record in compare.alias_set_diffs(
+            frozenset(mesa_alias_sets.keys()),
+            frozenset(opengl_alias_sets.keys()), 'mesa', 'opengl'):
+        yield record
+
+
+sink = compare.make_sink()
+compare.emit(diffs(), sink)
+sink.close()
@@ -3,6 +3,9 @@ import extensions
 import opengl
 
 
-compare.diff_functions_by_extension(
-    extensions.FUNCTIONS_BY_EXTENSION, opengl.FUNCTIONS_BY_EXTENSION,
-    'extension specs', 'opengl')
+sink = compare.make_sink()
+compare.emit(compare.function_bitsets_by_extension_diffs(
+    extensions.FUNCTION_BITSETS_BY_EXTENSION,
+    opengl.FUNCTION_BITSETS_BY_EXTENSION,
+    'extension specs', 'opengl'), sink)
+sink.close()
@@ -1,10 +1,24 @@
+import bitsets
+import collections
+import io
+import itertools
 import os
 import os.path
+import parse_cache
 import re
+import registry
+import sys
 
 
-# Map from extension name to a list of functions defined by that extension.
-FUNCTIONS_BY_EXTENSION = {}
+# Tables loaded by main() the first time they are accessed (see
+# registry.py):
+#
+# FUNCTIONS_BY_EXTENSION: map from extension name to a list of
+# functions defined by that extension.
+#
+# FUNCTION_BITSETS_BY_EXTENSION: FUNCTIONS_BY_EXTENSION with each list
+# of functions converted to a bitset (see bitsets.py).
+TABLES = ['FUNCTIONS_BY_EXTENSION', 'FUNCTION_BITSETS_BY_EXTENSION']
 
 
 FUNC_PREFIX_PATTERN = r'^([a-zA-Z0-9_]+ +)+\**'
@@ -59,43 +73,281 @@ FILES_TO_SKIP = frozenset([
         'EXT/coordinate_frame.txt',
         ])
 
+# Headers (lowercased) of the section listing an extension's functions.
+PROCS_HEADERS = frozenset([
+        'new procedures and functions',
+        'new procedure and functions',
+        'new functions and procedures',
+        ])
+
+# Matches, in the raw bytes of a spec file, the lines
+# process_spec_file() starts a section at: 'Name', or one of
+# PROCS_HEADERS in any case (without indentation, but possibly with
+# trailing whitespace).
+SECTION_START_REGEXP = re.compile(
+    r'^(?:Name|(?i:{0}))[^\S\n]*$'.format(
+        '|'.join(re.escape(header) for header in sorted(PROCS_HEADERS)))
+    .encode('ascii'),
+    re.MULTILINE)
+
+# The encoding of the spec files.  Anything that doesn't decode is
+# ignored.
+SPEC_FILE_ENCODING = 'utf-8'
+
 MISSING_FUNCTION_SUFFIXES = {
     'ATI/vertex_streams.txt': 'ATI',
     }
 
+# Rules for the lines of a "New Procedures and Functions" section that
+# aren't function declarations.  Each rule is (action, match, text),
+# where:
+# - action is 'end' if the line ends the section, or 'skip' if it
+#   should be ignored.  'end' rules take precedence, and don't apply to
+#   the continuation of a declaration split across lines.
+# - match is 'exact' or 'prefix' to match lines that are equal to, or
+#   start with, text (ignoring indentation), or 'unindented_exact' or
+#   'unindented_prefix' to only match lines that aren't indented.
+#
+# The rules are compiled into a dict lookup and a single regexp (see
+# compile_line_rules()), so adding one costs (almost) nothing per line.
+PROCS_LINE_RULES = [
+    ('end', 'unindented_exact', 'New Types'),
+    ('end', 'unindented_exact', 'New Tokens'),
+    ('end', 'unindented_exact', 'Issues'),
+    ('end', 'unindented_prefix', 'Additions to '),
+    ('end', 'unindented_prefix', 'Modifications to '),
+    ('end', 'exact', 'None'),
+    ('end', 'exact', 'None.'),
+    # TODO: HACK
+    ('end', 'exact', 'Note that GetIntegerIndexedvEXT, EnableIndexedEXT, DisableIndexedEXT and'),
+    # TODO: HACK
+    ('skip', 'prefix', '(All of the following'),
+    ('skip', 'prefix', '(note: '),
+    ('skip', 'prefix', '(Note: '),
+    ('skip', 'prefix', '(the following '),
+    ('skip', 'prefix', 'These routines '),
+    ('skip', 'prefix', 'The following '),
+    ('skip', 'prefix', '(added if '),
+    ('skip', 'prefix', '(The following function '),
+    ('skip', 'prefix', 'NOTE: '),
+    # TODO: HACK
+    ('skip', 'exact', 'GRAPHICS RESET DETECTION AND RECOVERY'),
+    ('skip', 'exact', 'SIZED BUFFER QUERIES'),
+    ('skip', 'exact', 'OpenGL 1.0 sized buffer queries'),
+    ('skip', 'exact', 'ARB_imaging sized buffer queries'),
+    ('skip', 'exact', 'OpenGL 1.3 sized buffer queries'),
+    ('skip', 'exact', 'OpenGL 2.0 sized buffer queries'),
+    ('skip', 'exact', 'The only allowable value for <target> at this time is'),
+    ('skip', 'exact', 'PIXEL_TRANSFORM_2D_EXT.  Allowable values for <pname> include:'),
+    ('skip', 'exact', 'PIXEL_MAG_FILTER_EXT, PIXEL_MIN_FILTER_EXT, and PIXEL_CUBIC_WEIGHT_EXT.'),
+    ('skip', 'exact', 'PATH SPECIFICATION COMMANDS'),
+    ('skip', 'exact', 'PATH NAME MANAGEMENT'),
+    ('skip', 'exact', 'PATH STENCILING'),
+    ('skip', 'exact', 'PATH COVERING'),
+    ('skip', 'exact', 'PATH QUERIES'),
+    ('skip', 'exact', 'For creating, updating, and querying object buffers:'),
+    ('skip', 'exact', 'For defining vertex arrays inside an object buffer:'),
+    ('skip', 'exact', 'For querying vertex arrays inside an object buffer:'),
+    ('skip', 'exact', 'If EXT_vertex_shader is defined, for defining variant arrays inside'),
+    ('skip', 'exact', 'an object buffer:'),
+    ('skip', 'exact', 'If EXT_vertex_shader is defined, for querying variant arrays inside'),
+    ]
+
+
+# Map from rule in PROCS_LINE_RULES to the number of lines it has
+# matched in the spec files loaded by main().
+RULE_HITS = collections.Counter()
+
+
+# Compile the given rules into a matcher for classify_procs_line():
+# - a map from text to rule, for the 'exact' and 'unindented_exact'
+#   rules,
+# - a regexp that matches a line if any of the 'prefix' and
+#   'unindented_prefix' rules does (and never, if there are none), with
+#   a group named 'rule<i>' for rules[i], and
+# - a map from group name to rule.
+# Since alternatives are tried in order, 'end' rules go first.  Two
+# 'exact'/'unindented_exact' rules with the same text, or two prefix
+# rules with the same match and text, are an error, since only one of
+# them could ever apply.
+def compile_line_rules(rules):
+    rules = sorted(rules, key=lambda rule: rule[0] != 'end')
+    exact_rules = {}
+    patterns = []
+    prefix_rules = {}
+    prefixes_seen = set()
+    for i, rule in enumerate(rules):
+        action, match, text = rule
+        if match.endswith('exact'):
+            if text in exact_rules:
+                raise Exception('Conflicting rules {0!r} and {1!r}'.format(
+                        exact_rules[text], rule))
+            exact_rules[text] = rule
+            continue
+        if (match, text) in prefixes_seen:
+            raise Exception('Duplicate rule {0!r}'.format(rule))
+        prefixes_seen.add((match, text))
+        pattern = re.escape(text)
+        if not match.startswith('unindented_'):
+            pattern = r'\s*' + pattern
+        group_name = 'rule{0}'.format(i)
+        patterns.append('(?P<{0}>{1})'.format(group_name, pattern))
+        prefix_rules[group_name] = rule
+    prefix_regexp = re.compile('|'.join(patterns) or '(?!)')
+    return exact_rules, prefix_regexp, prefix_rules
+
+
+PROCS_LINE_MATCHER = compile_line_rules(PROCS_LINE_RULES)
+SKIP_LINE_MATCHER = compile_line_rules(
+    [rule for rule in PROCS_LINE_RULES if rule[0] == 'skip'])
+
+
+# Return the rule compiled into matcher that matches line (which must
+# have no trailing whitespace), or None.  If both an 'end' and a
+# 'skip' rule match, the 'end' rule wins.
+def classify_procs_line(matcher, line):
+    exact_rules, prefix_regexp, prefix_rules = matcher
+    stripped = line.lstrip()
+    rule = exact_rules.get(stripped)
+    if rule is not None and len(stripped) != len(line) and \
+            rule[1] == 'unindented_exact':
+        rule = None
+    if rule is not None and rule[0] == 'end':
+        return rule
+    m = prefix_regexp.match(line)
+    if m is not None and (rule is None or prefix_rules[m.lastgroup][0] == 'end'):
+        return prefix_rules[m.lastgroup]
+    return rule
+
+
+def expansion_choices(chars):
+    if chars in COMPLEX_EXPANSIONS:
+        return tuple(COMPLEX_EXPANSIONS[chars])
+    elif ',' in chars:
+        return tuple(chars.split(','))
+    else:
+        return tuple(chars)
+
+
+# Map from function name pattern to the tuple of names it expands to.
+# The same patterns turn up in many spec files, so each one is only
+# expanded once per load: main() clears it, and it is also cleared
+# whenever it reaches MAX_EXPANSIONS entries, so that a long-running
+# process (or a worker parsing many files) doesn't grow it without
+# bound.
+EXPANSIONS = {}
+MAX_EXPANSIONS = 10000
 
+
+# Return a tuple of the function names that name expands to, e.g.
+# 'VertexAttrib{12}{sf}v' expands to ('VertexAttrib1sv',
+# 'VertexAttrib1fv', 'VertexAttrib2sv', 'VertexAttrib2fv').  Expansions
+# further left vary slowest.
 def expand_function_name(name):
+    if name in EXPANSIONS:
+        return EXPANSIONS[name]
     if '{' not in name:
-        yield name
-        return
-    m = EXPANSION_REGEXP.search(name)
-    if m:
-        expansion = m.group('chars')
-        if expansion in COMPLEX_EXPANSIONS:
-            expansion = COMPLEX_EXPANSIONS[expansion]
-        elif ',' in expansion:
-            expansion = expansion.split(',')
-        for c in expansion:
-            new_name = name[:m.start()] + c + name[m.end():]
-            for name2 in expand_function_name(new_name):
-                yield name2
+        names = (name,)
     else:
-        raise Exception("Don't know how to expand {0!r}".format(name))
+        # Split into alternating literal text and brace contents, and
+        # take the cartesian product of the choices for each.
+        parts = EXPANSION_REGEXP.split(name)
+        segments = []
+        for i, part in enumerate(parts):
+            if i % 2 == 0:
+                if '{' in part or '}' in part:
+                    raise Exception(
+                        "Don't know how to expand {0!r}".format(name))
+                segments.append((part,))
+            else:
+                segments.append(expansion_choices(part))
+        names = tuple(''.join(p) for p in itertools.product(*segments))
+    if len(EXPANSIONS) >= MAX_EXPANSIONS:
+        EXPANSIONS.clear()
+    EXPANSIONS[name] = names
+    return names
 
 
-def process_spec_file(spec_dir, filename, f):
+def get_function_suffix(spec_dir, filename):
     full_spec_file_name = spec_dir + '/' + filename
-    if full_spec_file_name in FILES_TO_SKIP:
-        return
     if full_spec_file_name in MISSING_FUNCTION_SUFFIXES:
-        suffix = MISSING_FUNCTION_SUFFIXES[full_spec_file_name]
-    else:
-        suffix = ''
+        return MISSING_FUNCTION_SUFFIXES[full_spec_file_name]
+    return ''
+
+
+# Return (spec_dir, filename) for the spec file at path, where spec_dir
+# is the vendor directory (e.g. 'ARB') containing it.
+def split_spec_path(path):
+    spec_dir_fullpath, filename = os.path.split(path)
+    return os.path.basename(spec_dir_fullpath), filename
+
+
+# Parse the spec files at the given paths, using the cache if possible
+# and registry.JOBS worker processes for the rest.  Return a list
+# containing the result of process_spec_file() for each file.  Files
+# in FILES_TO_SKIP aren't opened at all.
+def parse_spec_files(paths):
+    results = [None] * len(paths)
+    indices = []
+    extras = []
+    for i, path in enumerate(paths):
+        spec_dir, filename = split_spec_path(path)
+        if spec_dir + '/' + filename in FILES_TO_SKIP:
+            continue
+        indices.append(i)
+        extras.append((spec_dir, filename,
+                       get_function_suffix(spec_dir, filename)))
+    parsed = parse_cache.cached_map(read_spec_file,
+                                    [paths[i] for i in indices], 'extensions',
+                                    parse_cache.source_version(__file__),
+                                    extras, registry.JOBS)
+    for i, result in zip(indices, parsed):
+        results[i] = result
+    return results
+
+
+# Parse the spec file at path, bypassing the cache.
+def read_spec_file(path):
+    spec_dir, filename = split_spec_path(path)
+    with open(path, 'rb') as f:
+        return process_spec_file(spec_dir, filename, f)
+
+
+# Return an iterator over the lines of the binary file f, from its
+# current position on, decoding each one as it is reached.
+def decode_lines(f):
+    return (line.decode(SPEC_FILE_ENCODING, 'ignore') for line in f)
+
+
+def add_extension(extension_name, functions):
+    if extension_name in FUNCTIONS_BY_EXTENSION:
+        raise Exception('Duplicate extension {0}'.format(extension_name))
+    FUNCTIONS_BY_EXTENSION[extension_name] = functions
+
+
+# Parse the spec file f (opened in binary mode).  Return
+# (extension_name, functions, rule_hits), where rule_hits maps each
+# rule in PROCS_LINE_RULES that matched any lines to the number of
+# lines, or None if the file should be skipped.
+def process_spec_file(spec_dir, filename, f):
+    if spec_dir + '/' + filename in FILES_TO_SKIP:
+        return None
+    rule_hits = collections.Counter()
+    suffix = get_function_suffix(spec_dir, filename)
     extension_name = None
     section = None
     procedures_and_functions = None
-    func_start = None
-    for line in f:
+    data = f.read()
+    if b'\r' in data:
+        # Universal newlines, as if the file had been opened in text
+        # mode.
+        data = data.replace(b'\r\n', b'\n').replace(b'\r', b'\n')
+    f = io.BytesIO(data)
+    lines = decode_lines(f)
+    while True:
+        line = next(lines, None)
+        if line is None:
+            break
         line = line.rstrip()
         if line == '':
             pass
@@ -104,88 +356,27 @@ def process_spec_file(spec_dir, filename, f):
         elif section == 'name':
             extension_name = line.strip()
             section = None
-        elif line.lower() in ('new procedures and functions',
-                              'new procedure and functions',
-                              'new functions and procedures'):
-            procedures_and_functions = []
-            section = 'procs'
-        elif section == 'procs':
-            if func_start is None and line in ('New Types', 'New Tokens', 'Issues'):
-                section = None
+        elif line.lower() in PROCS_HEADERS:
+            procedures_and_functions, next_line = read_procs_section(
+                lines, suffix, rule_hits)
+            if next_line is not None:
+                # The section ran into the start of another one; handle
+                # that line as usual.
+                lines = itertools.chain([next_line], lines)
                 continue
-            if func_start is None and line.startswith('Additions to '):
-                section = None
-                continue
-            if func_start is None and line.startswith('Modifications to '):
-                section = None
-                continue
-            line = line.strip()
-            if func_start is None and line in ('None', 'None.'):
-                section = None
-                continue
-            # TODO: HACK
-            if func_start is None and line == 'Note that GetIntegerIndexedvEXT, EnableIndexedEXT, DisableIndexedEXT and':
-                section = None
-                continue
-            if func_start:
-                line = func_start + ' ' + line
-                func_start = None
-            if '(' in line and not ')' in line:
-                func_start = line
-                continue
-            # TODO: HACK
-            if line.startswith('(All of the following'):
-                continue
-            if line.startswith('(note: '):
-                continue
-            if line.startswith('(Note: '):
-                continue
-            if line.startswith('(the following '):
-                continue
-            if line.startswith('These routines '):
-                continue
-            if line.startswith('The following '):
-                continue
-            if line.startswith('(added if '):
-                continue
-            if line.startswith('(The following function '):
-                continue
-            if line.startswith('NOTE: '):
-                continue
-            # TODO: HACK
-            if line in ('GRAPHICS RESET DETECTION AND RECOVERY',
-                        'SIZED BUFFER QUERIES',
-                        'OpenGL 1.0 sized buffer queries',
-                        'ARB_imaging sized buffer queries',
-                        'OpenGL 1.3 sized buffer queries',
-                        'OpenGL 2.0 sized buffer queries',
-                        'The only allowable value for <target> at this time is',
-                        'PIXEL_TRANSFORM_2D_EXT.  Allowable values for <pname> include:',
-                        'PIXEL_MAG_FILTER_EXT, PIXEL_MIN_FILTER_EXT, and PIXEL_CUBIC_WEIGHT_EXT.',
-                        'PATH SPECIFICATION COMMANDS',
-                        'PATH NAME MANAGEMENT',
-                        'PATH STENCILING',
-                        'PATH COVERING',
-                        'PATH QUERIES',
-                        'For creating, updating, and querying object buffers:',
-                        'For defining vertex arrays inside an object buffer:',
-                        'For querying vertex arrays inside an object buffer:',
-                        'If EXT_vertex_shader is defined, for defining variant arrays inside',
-                        'an object buffer:',
-                        'If EXT_vertex_shader is defined, for querying variant arrays inside',
-                        ):
-                continue
-            m = FUNCTION_REGEXP.match(line)
-            # TODO: HACK
+        if section is None and extension_name is not None and \
+                procedures_and_functions is not None:
+            # We have everything we need, unless a later Name or
+            # procedures section overrides it (the last one wins).  The
+            # rest of the file (issues, tokens, spec edits...) is
+            # usually the bulk of it, so rather than decoding it and
+            # going through it line by line, search its bytes for those
+            # sections, and only decode from the next one (if any).
+            m = SECTION_START_REGEXP.search(data, f.tell())
             if m is None:
-                raise Exception(
-                    'Cannot parse proc/function line: {0!r}'.format(line))
-            for name in expand_function_name(m.group('name')):
-                if name.startswith('gl'):
-                    name = name[2:]
-                if suffix and not name.endswith(suffix):
-                    name = name + suffix
-                procedures_and_functions.append(name)
+                break
+            f.seek(m.start())
+            lines = decode_lines(f)
     assert extension_name is not None
     # TODO: HACK
     if os.path.join(spec_dir, filename) not in (
@@ -195,19 +386,172 @@ def process_spec_file(spec_dir, filename, f):
         assert procedures_and_functions is not None
     if procedures_and_functions is None:
         procedures_and_functions = []
-    if extension_name in FUNCTIONS_BY_EXTENSION:
-        raise Exception('Duplicate extension {0}'.format(extension_name))
-    FUNCTIONS_BY_EXTENSION[extension_name] = procedures_and_functions
+    return extension_name, procedures_and_functions, dict(rule_hits)
 
 
-def main():
-    spec_root = '/home/pberry/opengl-docs/www.opengl.org/registry/specs/'
-    for spec_dir in os.listdir(spec_root):
+# Parse the body of a "New Procedures and Functions" section from
+# lines, an iterator over the lines following the header, stopping
+# after the line that ends the section.  A 'Name' line or another
+# procedures header also ends the section, but belongs to what
+# follows.  Return (functions, next_line), where functions is the list
+# of functions the section declares and next_line is the line that
+# started another section (or None), and count the PROCS_LINE_RULES
+# hits in rule_hits.
+def read_procs_section(lines, suffix, rule_hits):
+    procedures_and_functions = []
+    func_start = None
+    for line in lines:
+        line = line.rstrip()
+        if line == '':
+            continue
+        if line == 'Name' or line.lower() in PROCS_HEADERS:
+            return procedures_and_functions, line
+        rule = None
+        if func_start is None:
+            rule = classify_procs_line(PROCS_LINE_MATCHER, line)
+            if rule is not None and rule[0] == 'end':
+                rule_hits[rule] += 1
+                break
+        line = line.strip()
+        if func_start:
+            line = func_start + ' ' + line
+            func_start = None
+            rule = classify_procs_line(SKIP_LINE_MATCHER, line)
+        if '(' in line and not ')' in line:
+            func_start = line
+            continue
+        if rule is not None:
+            rule_hits[rule] += 1
+            continue
+        m = FUNCTION_REGEXP.match(line)
+        # TODO: HACK
+        if m is None:
+            raise Exception(
+                'Cannot parse proc/function line: {0!r}'.format(line))
+        for name in expand_function_name(m.group('name')):
+            if name.startswith('gl'):
+                name = name[2:]
+            if suffix and not name.endswith(suffix):
+                name = name + suffix
+            procedures_and_functions.append(name)
+    return procedures_and_functions, None
+
+
+# Return the paths of all the spec files in the registry.  They are
+# sorted so that which file a "Duplicate extension" error is reported
+# for, and the order of FUNCTIONS_BY_EXTENSION, don't depend on
+# directory listing order.
+def list_spec_files():
+    spec_root = os.path.join(registry.OPENGL_REGISTRY_DIR, 'specs')
+    paths = []
+    for spec_dir in sorted(os.listdir(spec_root)):
         spec_dir_fullpath = os.path.join(spec_root, spec_dir)
-        for file in os.listdir(spec_dir_fullpath):
+        for file in sorted(os.listdir(spec_dir_fullpath)):
             assert file.endswith('.txt')
-            with open(os.path.join(spec_dir_fullpath, file),
-                      errors='ignore') as f:
-                process_spec_file(spec_dir, file, f)
+            paths.append(os.path.join(spec_dir_fullpath, file))
+    return paths
+
+
+# Map from the specs directory of a registry to the map from extension
+# name to spec file path returned by load_spec_index().
+SPEC_INDEXES = {}
+
+
+# Return a map from extension name to the path of the spec file
+# defining it.
+#
+# The extension name of each file is kept in the parse cache (if
+# enabled), keyed by registry directory, along with the file's mtime
+# and size; only files whose mtime or size has changed are parsed again
+# (with parse_spec_files(), so that the names are exactly the ones
+# main() would find).  So apart from the first call, this just lists
+# and stats the spec files.  The result is also remembered for the rest
+# of the process.
+def load_spec_index():
+    spec_root = os.path.abspath(
+        os.path.join(registry.OPENGL_REGISTRY_DIR, 'specs'))
+    if spec_root in SPEC_INDEXES:
+        return SPEC_INDEXES[spec_root]
+    key = parse_cache.data_key('extensions-index',
+                               parse_cache.source_version(__file__),
+                               spec_root)
+    old_entries = {}
+    if parse_cache.ENABLED:
+        found, value = parse_cache.lookup(key)
+        if found:
+            old_entries = value
+    entries = {}
+    stale = []
+    for path in list_spec_files():
+        spec_dir, filename = split_spec_path(path)
+        if spec_dir + '/' + filename in FILES_TO_SKIP:
+            continue
+        st = os.stat(path)
+        entry = old_entries.get(path)
+        if entry is None or entry[:2] != (st.st_mtime_ns, st.st_size):
+            stale.append((path, st))
+        else:
+            entries[path] = entry
+    results = parse_spec_files([path for path, st in stale])
+    for (path, st), (extension_name, functions, rule_hits) in zip(stale,
+                                                                  results):
+        entries[path] = (st.st_mtime_ns, st.st_size, extension_name)
+    if parse_cache.ENABLED and entries != old_entries:
+        parse_cache.store(key, entries)
+    index = {}
+    for path in sorted(entries):
+        mtime, size, extension_name = entries[path]
+        if extension_name in index:
+            raise Exception('Duplicate extension {0}'.format(extension_name))
+        index[extension_name] = path
+    SPEC_INDEXES[spec_root] = index
+    return index
+
+
+# Return the list of functions defined by the given extension (the same
+# as FUNCTIONS_BY_EXTENSION[extension_name]), parsing only its spec
+# file.  Raises KeyError if no spec file defines the extension.
+def get_extension_functions(extension_name):
+    path = load_spec_index()[extension_name]
+    extension_name, functions, rule_hits = parse_spec_files([path])[0]
+    return functions
 
-main()
+
+def main():
+    global FUNCTIONS_BY_EXTENSION, FUNCTION_BITSETS_BY_EXTENSION
+    FUNCTIONS_BY_EXTENSION = {}
+    RULE_HITS.clear()
+    EXPANSIONS.clear()
+    paths = list_spec_files()
+    for result in parse_spec_files(paths):
+        if result is not None:
+            extension_name, functions, rule_hits = result
+            add_extension(extension_name, functions)
+            RULE_HITS.update(rule_hits)
+    FUNCTION_BITSETS_BY_EXTENSION = bitsets.bitsets_by_key(
+        FUNCTIONS_BY_EXTENSION)
+
+
+# Print how many lines each of PROCS_LINE_RULES matched, so that rules
+# that no longer match anything can be spotted and removed.  main()
+# must have been called first.
+def report_rule_hits():
+    for rule in PROCS_LINE_RULES:
+        action, match, text = rule
+        print('{0:6} {1:4} {2:17} {3!r}'.format(
+                RULE_HITS[rule], action, match, text))
+
+
+__getattr__ = registry.lazy_tables(__name__, main, TABLES)
+
+
+# With arguments, print the functions defined by each of the named
+# extensions; otherwise load every spec file and report the rule hits.
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        for extension_name in sys.argv[1:]:
+            for function in get_extension_functions(extension_name):
+                print(function)
+    else:
+        main()
+        report_rule_hits()
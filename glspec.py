@@ -1,8 +1,12 @@
 import os.path
+import registry
 import spec_file
 
 
-# Map from function name to a hash with key/value pairs:
+# Tables loaded by main() the first time they are accessed (see
+# registry.py):
+#
+# FUNCTIONS: map from function name to a hash with key/value pairs:
 # - 'abstract_return': return type of the function (as defined in
 #                      gl.tm).
 # - 'params': list of function parameters.
@@ -24,7 +28,9 @@ import spec_file
 #                 'array')
 # - 'array_retained': True if the array is annotated as "retained"
 #                     (present only if pointer_type is 'array')
-FUNCTIONS = {}
+#
+# SOURCE_FILES: list of the files FUNCTIONS was loaded from.
+TABLES = ['FUNCTIONS', 'SOURCE_FILES']
 
 
 # Known bugs in gl.spec: some functions are missing "deprecated"
@@ -185,13 +191,14 @@ FUNCTION_ALIAS_FIXES = {
 
 
 def main():
-    global FUNCTIONS
-    spec_dir = '/home/pberry/opengl-docs/www.opengl.org/registry/api/'
+    global FUNCTIONS, SOURCE_FILES
+    spec_dir = os.path.join(registry.OPENGL_REGISTRY_DIR, 'api')
     glspec_file = os.path.join(spec_dir, 'gl.spec')
     FUNCTIONS = spec_file.parse_spec_file(glspec_file,
                                           FUNCTIONS_MISSING_DEPRECATION,
                                           FUNCTIONS_ERRONEOUSLY_DEPRECATED,
                                           FUNCTION_ALIAS_FIXES)
+    SOURCE_FILES = [glspec_file]
 
 
-main()
+__getattr__ = registry.lazy_tables(__name__, main, TABLES)
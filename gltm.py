@@ -1,16 +1,23 @@
+import registry
 import tm_file
 import os.path
 
 
-# Map from abstract type name to C type.
-TYPE_MAP = {}
+# Tables loaded by main() the first time they are accessed (see
+# registry.py):
+#
+# TYPE_MAP: map from abstract type name to C type.
+#
+# SOURCE_FILES: list of the files TYPE_MAP was loaded from.
+TABLES = ['TYPE_MAP', 'SOURCE_FILES']
 
 
 def main():
-    global TYPE_MAP
-    spec_dir = '/home/pberry/opengl-docs/www.opengl.org/registry/api/'
+    global TYPE_MAP, SOURCE_FILES
+    spec_dir = os.path.join(registry.OPENGL_REGISTRY_DIR, 'api')
     gltm_file = os.path.join(spec_dir, 'gl.tm')
     TYPE_MAP = tm_file.parse_type_map(gltm_file)
+    SOURCE_FILES = [gltm_file]
 
 
-main()
+__getattr__ = registry.lazy_tables(__name__, main, TABLES)
@@ -1,13 +1,21 @@
 import alias_sets
+import bitsets
 import os
 import os.path
+import parse_cache
 import re
+import records
+import registry
 import relation
 import sanity
+import signature
 import xml.etree.ElementTree as etree
 
 
-# Map from function name to a hash with key/value pairs:
+# Tables loaded by main() the first time they are accessed (see
+# registry.py):
+#
+# FUNCTIONS: map from function name to a hash with key/value pairs:
 # - 'return': C return type of the function.
 # - 'params': list of function parameters.
 # - 'deprecated': For deprecated functions, GL version in which
@@ -30,20 +38,27 @@ import xml.etree.ElementTree as etree
 # Each function parameter is a hash with key/value pairs:
 # - 'name': name of the parameter.
 # - 'type': C type of the parameter.
-FUNCTIONS = {}
-
-
-# Map from extension name to a list of functions defined by that
-# extension.  Gleaned from the category each function appears in.
-FUNCTIONS_BY_EXTENSION = {}
-
-
-# Map from function name to a list of extensions that define it.
-EXTENSIONS_BY_FUNCTION = {}
-
-
-# List of all function alias sets, each of which is a hash with
-# key/value pairs:
+#
+# FUNCTIONS_BY_EXTENSION: map from extension name to a tuple of
+# functions defined by that extension.  Gleaned from the category each
+# function appears in.
+#
+# FUNCTION_BITSETS_BY_EXTENSION: FUNCTIONS_BY_EXTENSION with each list
+# of functions converted to a bitset (see bitsets.py).
+#
+# EXTENSIONS_BY_FUNCTION: map from function name to a sorted tuple of
+# extensions that define it.
+#
+# EXTENSION_FUNCTIONS: the relation.Relation between extension names
+# and function names; FUNCTIONS_BY_EXTENSION and EXTENSIONS_BY_FUNCTION
+# are its two directions, so both stay up to date as categories are
+# added.
+#
+# SIGNATURES: map from function name to its normalized signature (a
+# signature.SignatureTable, which computes each one on first use).
+#
+# ALIAS_SETS: list of all function alias sets, each of which is a hash
+# with key/value pairs:
 # - 'canonical_name': canonical function name for the alias set
 # - 'functions': list of names of functions in this alias set
 #                (includes the canonical name).
@@ -70,12 +85,43 @@ EXTENSIONS_BY_FUNCTION = {}
 #    name.
 # ****As in *, but if there is an inconsistency, then the minimum
 #     value is taken.
-ALIAS_SETS = []
+#
+# ALIAS_SETS_BY_FUNCTION: map from function name to the alias set
+# containing it.  The alias sets are the same objects as in the
+# ALIAS_SETS list.
+#
+# ALIAS_SET_INDEX: the AliasSetIndex that ALIAS_SETS and
+# ALIAS_SETS_BY_FUNCTION come from (see replace_functions()).
+#
+# SOURCE_FILES: list of the XML files the other tables were loaded
+# from.
+TABLES = ['FUNCTIONS', 'FUNCTIONS_BY_EXTENSION',
+          'FUNCTION_BITSETS_BY_EXTENSION', 'EXTENSIONS_BY_FUNCTION',
+          'EXTENSION_FUNCTIONS', 'SIGNATURES', 'ALIAS_SETS',
+          'ALIAS_SETS_BY_FUNCTION', 'ALIAS_SET_INDEX', 'SOURCE_FILES']
+
 
+# If true, read_xml_file() parses each file incrementally (see
+# stream_xml_file()) instead of building its whole ElementTree first.
+# This keeps memory use flat no matter how big the files are.  The
+# results should be the same either way, but since nothing guarantees
+# it, this is part of the cache key (see xml_settings()).
+STREAM_XML = os.environ.get('OPENGL_API_STREAM_XML', '0') != '0'
 
-# Map from function name to the alias set containing it.  The alias
-# sets are the same objects as in the ALIAS_SETS list.
-ALIAS_SETS_BY_FUNCTION = {}
+
+# main() loads this file (relative to the glapi gen directory) and the
+# files it reaches through xi:include, each exactly once.  This is the
+# set of files Mesa's own generators see, and it avoids reading
+# anything else that happens to be in the directory.  None (the
+# default) means the first of DEFAULT_ROOT_XML_FILES that exists; the
+# empty string means load every XML file in the directory instead,
+# ignoring includes (as older versions of this module did).  The
+# directory scan is also the fallback when no root file exists.
+ROOT_XML_FILE = os.environ.get('OPENGL_API_MESA_ROOT_XML')
+DEFAULT_ROOT_XML_FILES = ('gl_and_es_API.xml', 'gl_API.xml')
+
+
+XINCLUDE_TAG = '{http://www.w3.org/2001/XInclude}include'
 
 
 GL_VERSION_NUMBER_REGEXP = re.compile(r'^[0-9]\.[0-9]$')
@@ -84,50 +130,293 @@ NAME_MODIFICATION_REGEXP = re.compile(
     r'^(-(?P<minus>[a-zA-Z0-9_]+))?(\+(?P<plus>[a-zA-Z0-9_]+))?$')
 
 
-def check_attribs(elem, required_attribs, optional_attribs):
-    attribs_present = set(elem.attrib.keys())
-    required_attribs = set(required_attribs)
-    optional_attribs = set(optional_attribs)
+# Map from element tag to (required attribs, optional attribs).
+ATTRIB_SCHEMA = {
+    'OpenGLAPI': ([], []),
+    XINCLUDE_TAG: (['href'], []),
+    'category': (['name'], ['number', 'window_system']),
+    'function': (['name'],
+                 ['vectorequiv', 'offset', 'alias', 'static_dispatch', 'es1',
+                  'es2', 'deprecated', 'desktop', 'exec', 'mesa_name']),
+    'return': (['type'], []),
+    'glx': ([], ['sop', 'rop', 'large', 'handcode', 'always_array',
+                 'dimensions_in_reply', 'img_reset', 'ignore', 'vendorpriv',
+                 'doubles_in_order']),
+    'param': (['type', 'name'],
+              ['counter', 'variable_param', 'count', 'img_type', 'img_width',
+               'img_pad_dimensions', 'img_height', 'img_target', 'img_format',
+               'img_send_null', 'output', 'client_only', 'img_depth',
+               'padding', 'img_xoff', 'img_yoff', 'img_null_flag', 'img_zoff',
+               'img_extent', 'img_woff', 'count_scale']),
+    'type': (['name', 'size'], ['float', 'unsigned', 'glx_name', 'pointer']),
+    'enum': (['name', 'value'], ['count']),
+    'size': (['name'], ['mode', 'count']),
+    }
+
+
+# ATTRIB_SCHEMA compiled into a map from element tag to (frozenset of
+# required attribs, frozenset of allowed attribs).
+COMPILED_ATTRIB_SCHEMA = dict(
+    (tag, (frozenset(required), frozenset(required) | frozenset(optional)))
+    for tag, (required, optional) in ATTRIB_SCHEMA.items())
+
+
+# If false, check_attribs() does nothing.  Only worth turning off for
+# trusted inputs.  This is part of the cache key (see xml_settings()),
+# so results parsed without validation are never reused by a run that
+# validates.
+VALIDATE_ATTRIBS = os.environ.get('OPENGL_API_VALIDATE_XML', '1') != '0'
+
+
+def check_attribs(elem):
+    if not VALIDATE_ATTRIBS:
+        return
+    required_attribs, allowed_attribs = COMPILED_ATTRIB_SCHEMA[elem.tag]
+    # Comparing the keys view against the frozensets doesn't build any
+    # new sets.
+    attribs_present = elem.attrib.keys()
+    if attribs_present <= allowed_attribs and \
+            attribs_present >= required_attribs:
+        return
     problems = []
     missing_required_attribs = required_attribs - attribs_present
     if missing_required_attribs:
         problems.append('lacks required attribs {0}'.format(
                 list(missing_required_attribs)))
-    unrecognized_attribs = \
-        attribs_present - required_attribs - optional_attribs
+    unrecognized_attribs = attribs_present - allowed_attribs
     if unrecognized_attribs:
         problems.append('contains extra attribs {0}'.format(
                 list(unrecognized_attribs)))
-    if problems:
-        raise Exception('{0} {1} {2}'.format(elem.tag, elem.attrib,
-                                             ' and '.join(problems)))
+    raise Exception('{0} {1} {2}'.format(elem.tag, elem.attrib,
+                                         ' and '.join(problems)))
+
+# Parse the XML file with the given name, using the cache if possible.
+# Return a list of the file's contents, in document order, each of
+# which is either:
+# - ('category', extension_name, functions) for each category
+#   (excluding GLX categories), where extension_name is None for
+#   categories that aren't extensions, and functions is a list of
+#   (function_name, function_dict) pairs, function_dict being in the
+#   form documented for FUNCTIONS above.
+# - ('include', href) for each xi:include.
+def parse_xml_file(filename):
+    settings = xml_settings()
+    return parse_cache.cached(filename, 'mesa', cache_version(),
+                              lambda: read_xml_file(filename, settings),
+                              settings)
+
+# Same as parse_xml_file(), for each of the given files, parsing those
+# that miss the cache in registry.JOBS worker processes.  The settings
+# are passed to the workers explicitly, since they may have been changed
+# since import.
+def parse_xml_files(filenames):
+    settings = xml_settings()
+    return parse_cache.cached_map(read_xml_file, filenames, 'mesa',
+                                  cache_version(), [settings] * len(filenames),
+                                  registry.JOBS, (settings,))
+
+# Return the parser version under which parse_xml_file() results are
+# cached.  The records in them are pickled by class name, so records.py
+# counts as part of the parser.
+def cache_version():
+    return parse_cache.source_version(__file__, records.__file__)
+
+# Return the settings that read_xml_file() depends on, which are part
+# of the cache key of its results: (STREAM_XML, VALIDATE_ATTRIBS).
+def xml_settings():
+    return (STREAM_XML, VALIDATE_ATTRIBS)
+
+# Same as parse_xml_file(), but bypassing the cache.  settings (as
+# returned by xml_settings(), by default in this process) are in effect
+# while the file is parsed.
+def read_xml_file(filename, settings=None):
+    global STREAM_XML, VALIDATE_ATTRIBS
+    if settings is None:
+        settings = xml_settings()
+    old_settings = xml_settings()
+    STREAM_XML, VALIDATE_ATTRIBS = settings
+    try:
+        if STREAM_XML:
+            return stream_xml_file(filename)
+        tree = etree.parse(filename)
+        assert tree.getroot().tag == 'OpenGLAPI'
+        return process_OpenGLAPI(tree.getroot())
+    finally:
+        STREAM_XML, VALIDATE_ATTRIBS = old_settings
+
+# Same as read_xml_file(), but using iterparse to process each child of
+# a category (e.g. each function) as soon as its end tag is seen, and
+# then discarding it.
+def stream_xml_file(filename):
+    contents = []
+    # Elements enclosing the current position.
+    stack = []
+    # ('category', extension_name, functions) for the category being
+    # read, or None if it is being skipped.
+    category = None
+    for event, elem in etree.iterparse(filename, events=('start', 'end')):
+        if event == 'start':
+            stack.append(elem)
+            if len(stack) == 1:
+                assert elem.tag == 'OpenGLAPI'
+                check_attribs(elem)
+            elif len(stack) == 2:
+                if elem.tag == 'category':
+                    if is_glx_category(elem):
+                        category = None
+                    else:
+                        category = ('category', category_extension_name(elem),
+                                    [])
+                elif elem.tag != XINCLUDE_TAG:
+                    raise Exception(
+                        'Unexpected {0} in OpenGLAPI'.format(elem.tag))
+            continue
+        stack.pop()
+        if len(stack) == 2:
+            if category is not None:
+                process_category_child(elem, category[2])
+        elif len(stack) == 1:
+            if elem.tag == 'category':
+                if category is not None:
+                    contents.append(category)
+            else:
+                contents.append(('include', process_include(elem)))
+        else:
+            continue
+        # Since the preceding siblings have already been removed, this
+        # is cheap.
+        stack[-1].remove(elem)
+    return contents
+
+# Add a category returned by parse_xml_file() to FUNCTIONS and
+# EXTENSION_FUNCTIONS.
+def add_category(extension_name, functions):
+    if extension_name is not None:
+        EXTENSION_FUNCTIONS.add_key(extension_name)
+    for name, function_dict in functions:
+        if name in FUNCTIONS:
+            raise Exception('Function {0} seen twice'.format(name))
+        FUNCTIONS[name] = function_dict
+        if extension_name is None:
+            EXTENSION_FUNCTIONS.add_value(name)
+        else:
+            EXTENSION_FUNCTIONS.add(extension_name, name)
+
+# Load every XML file in xml_dir, ignoring includes.  Return the list
+# of files loaded.
+def load_xml_directory(xml_dir):
+    # Sort the files so that the order in which functions are added
+    # (and hence which file a "seen twice" error is reported for) is
+    # deterministic.
+    xml_files = sorted(os.path.join(xml_dir, file)
+                       for file in os.listdir(xml_dir) if file.endswith('.xml'))
+    for contents in parse_xml_files(xml_files):
+        for item in contents:
+            if item[0] == 'category':
+                add_category(item[1], item[2])
+    return xml_files
+
+# Load root_file and every file reachable from it through includes.
+# Each file is parsed once, however many times it is included; files
+# at the same include depth are parsed in parallel.  The categories are
+# then added in the order XInclude processing would put them in, with
+# each file's contents added at its first include.  Return the list of
+# files loaded.
+def load_xml_includes(root_file):
+    root_file = os.path.realpath(root_file)
+    contents_by_file = {}
+    frontier = [root_file]
+    while frontier:
+        results = parse_xml_files(frontier)
+        next_frontier = []
+        for filename, contents in zip(frontier, results):
+            contents_by_file[filename] = contents
+            for item in contents:
+                if item[0] == 'include':
+                    included_file = resolve_include(filename, item[1])
+                    if included_file not in contents_by_file and \
+                            included_file not in next_frontier:
+                        next_frontier.append(included_file)
+        frontier = [filename for filename in next_frontier
+                    if filename not in contents_by_file]
+    files_added = set([root_file])
+    stack = [(root_file, iter(contents_by_file[root_file]))]
+    while stack:
+        filename, items = stack[-1]
+        item = next(items, None)
+        if item is None:
+            stack.pop()
+        elif item[0] == 'category':
+            add_category(item[1], item[2])
+        else:
+            included_file = resolve_include(filename, item[1])
+            if included_file not in files_added:
+                files_added.add(included_file)
+                stack.append(
+                    (included_file, iter(contents_by_file[included_file])))
+    return list(contents_by_file.keys())
+
+# Return the path of the file main() should load with
+# load_xml_includes(), or None to load the whole of xml_dir (see
+# ROOT_XML_FILE).
+def find_root_xml_file(xml_dir):
+    if ROOT_XML_FILE is not None:
+        return os.path.join(xml_dir, ROOT_XML_FILE) if ROOT_XML_FILE else None
+    for filename in DEFAULT_ROOT_XML_FILES:
+        path = os.path.join(xml_dir, filename)
+        if os.path.exists(path):
+            return path
+    return None
+
+def resolve_include(filename, href):
+    return os.path.realpath(os.path.join(os.path.dirname(filename), href))
 
 def process_OpenGLAPI(elem):
-    check_attribs(elem, [], [])
+    check_attribs(elem)
+    contents = []
     for child in elem:
         assert isinstance(child, etree.Element)
         if child.tag == 'category':
-            process_category(child)
-        elif child.tag == '{http://www.w3.org/2001/XInclude}include':
-            process_include(child)
+            category = process_category(child)
+            if category is not None:
+                contents.append(category)
+        elif child.tag == XINCLUDE_TAG:
+            contents.append(('include', process_include(child)))
         else:
             raise Exception('Unexpected {0} in OpenGLAPI'.format(child.tag))
+    return contents
 
 def process_include(elem):
-    check_attribs(elem, ['href'], [])
+    check_attribs(elem)
     assert len(elem) == 0
+    return elem.attrib['href']
 
 def process_category(elem):
-    check_attribs(elem, ['name'], ['number', 'window_system'])
-    category_name = elem.attrib['name']
+    if is_glx_category(elem):
+        # Not worrying about GLX extensions/functions for now.
+        return None
+    extension_name = category_extension_name(elem)
+    functions = []
+    for child in elem:
+        assert isinstance(child, etree.Element)
+        process_category_child(child, functions)
+    return 'category', extension_name, functions
+
+def is_glx_category(elem):
+    check_attribs(elem)
     window_system = elem.attrib.get('window_system', None)
-    if window_system is not None:
-        if window_system == 'glX':
-            # Not worrying about GLX extensions/functions for now.
-            return
-        raise Exception(
-            'Category {0} has unexpected window_system value {1!r}'.format(
-                category_name, window_system))
+    if window_system is None:
+        return False
+    if window_system == 'glX':
+        return True
+    raise Exception(
+        'Category {0} has unexpected window_system value {1!r}'.format(
+            elem.attrib['name'], window_system))
+
+# Return the name of the extension defined by the given category
+# element, or None if it isn't an extension.
+def category_extension_name(elem):
+    category_name = elem.attrib['name']
     if category_name.startswith('GL_'):
         extension_name = category_name[3:]
     elif category_name.startswith('GLX_'):
@@ -144,19 +433,17 @@ def process_category(elem):
         extension_name = category_name
     else:
         raise Exception('Unexpected category name {0!r}'.format(category_name))
-    if extension_name is not None and \
-            extension_name not in FUNCTIONS_BY_EXTENSION:
-        FUNCTIONS_BY_EXTENSION[extension_name] = []
-    for child in elem:
-        assert isinstance(child, etree.Element)
-        if child.tag == 'enum':
-            process_enum(child)
-        elif child.tag == 'type':
-            process_type(child)
-        elif child.tag == 'function':
-            process_function(child, extension_name)
-        else:
-            raise Exception('Unexpected {0} in category'.format(child.tag))
+    return extension_name
+
+def process_category_child(elem, functions):
+    if elem.tag == 'enum':
+        process_enum(elem)
+    elif elem.tag == 'type':
+        process_type(elem)
+    elif elem.tag == 'function':
+        functions.append(process_function(elem))
+    else:
+        raise Exception('Unexpected {0} in category'.format(elem.tag))
 
 
 def interpret_name_modification(name, mod):
@@ -175,10 +462,8 @@ def interpret_name_modification(name, mod):
     return new_name
 
 
-def process_function(elem, extension_name):
-    check_attribs(elem, ['name'],
-                  ['vectorequiv', 'offset', 'alias', 'static_dispatch', 'es1',
-                   'es2', 'deprecated', 'desktop', 'exec', 'mesa_name'])
+def process_function(elem):
+    check_attribs(elem)
     name = elem.attrib['name']
     return_type = 'void'
     deprecated = elem.attrib.get('deprecated', 'none')
@@ -209,107 +494,159 @@ def process_function(elem, extension_name):
             return_type = process_function_return(child)
         else:
             raise Exception('Unexpected {0} in function'.format(child.tag))
-    if name in FUNCTIONS:
-        raise Exception('Function {0} seen twice'.format(name))
-    function_dict = {'return': return_type, 'params': params, 'alias': alias,
-                     'desktop': desktop, 'mesa_name': mesa_name,
-                     'offset': offset, 'glx': glx}
-    for attr in ('deprecated', 'es1', 'es2', 'exec'):
+    values = []
+    for attr in ('es1', 'es2', 'exec'):
         value = elem.attrib.get(attr, 'none')
         if value == 'none':
             value = None
-        function_dict[attr] = value
-    FUNCTIONS[name] = function_dict
-    if extension_name is not None:
-        FUNCTIONS_BY_EXTENSION[extension_name].append(name)
+        values.append(value)
+    es1, es2, exec_ = values
+    return name, records.MesaFunction.from_values(
+        return_type, params, alias, desktop, mesa_name, offset, glx,
+        deprecated, es1, es2, exec_)
 
 def process_function_return(elem):
-    check_attribs(elem, ['type'], [])
+    check_attribs(elem)
     assert len(elem) == 0
     return elem.attrib['type']
 
 def process_function_glx(elem):
-    check_attribs(elem, [], ['sop', 'rop', 'large', 'handcode', 'always_array',
-                             'dimensions_in_reply', 'img_reset', 'ignore',
-                             'vendorpriv', 'doubles_in_order'])
+    check_attribs(elem)
     assert len(elem) == 0
 
 def process_function_param(elem, params):
-    check_attribs(elem, ['type', 'name'],
-                  ['counter', 'variable_param', 'count', 'img_type',
-                   'img_width', 'img_pad_dimensions', 'img_height',
-                   'img_target', 'img_format', 'img_send_null', 'output',
-                   'client_only', 'img_depth', 'padding', 'img_xoff',
-                   'img_yoff', 'img_null_flag', 'img_zoff', 'img_extent',
-                   'img_woff', 'count_scale'])
+    check_attribs(elem)
     assert len(elem) == 0
     param_type = elem.attrib['type']
     name = elem.attrib['name']
     padding = elem.attrib.get('padding', 'false') == 'true'
     if not padding:
-        params.append({'type': param_type, 'name': name})
+        params.append(records.MesaParam.from_values(param_type, name))
 
 def process_type(elem):
-    check_attribs(elem, ['name', 'size'],
-                  ['float', 'unsigned', 'glx_name', 'pointer'])
+    check_attribs(elem)
     assert len(elem) == 0
 
 def process_enum(elem):
-    check_attribs(elem, ['name', 'value'], ['count'])
+    check_attribs(elem)
     for child in elem:
         assert isinstance(child, etree.Element)
         assert child.tag == 'size'
         process_enum_size(child)
 
 def process_enum_size(elem):
-    check_attribs(elem, ['name'], ['mode', 'count'])
+    check_attribs(elem)
     assert len(elem) == 0
 
 def summarize_param(param):
     return '{0} {1}'.format(param['type'], param['name'])
 
 
-def collect_alias_data(alias_set):
-    for prop in ('deprecated', 'es1', 'exec', 'glx'):
-        value = None
-        for func in alias_set['functions']:
-            if FUNCTIONS[func][prop] is not None:
-                if value is None:
-                    value = FUNCTIONS[func][prop]
-                elif value != FUNCTIONS[func][prop]:
-                    value = 'inconsistent'
-        alias_set[prop] = value
-    value = None
-    for func in alias_set['functions']:
-        if FUNCTIONS[func]['es2'] is not None:
-            if value is None:
-                value = FUNCTIONS[func]['es2']
-            else:
-                value = min(value, FUNCTIONS[func]['es2'])
-    alias_set['es2'] = value
-    desktop = True
-    for func in alias_set['functions']:
-        if not FUNCTIONS[func]['desktop']:
-            desktop = False
-    alias_set['desktop'] = desktop
-    for prop in ('mesa_name', 'offset'):
-        alias_set[prop] = FUNCTIONS[alias_set['canonical_name']][prop]
+# Alias set properties aggregated as described by * above.
+CONSISTENT_PROPERTIES = ('deprecated', 'es1', 'exec', 'glx')
+
+
+# Set the aggregated properties of alias_set to their values for an
+# empty set (apart from those taken from the canonical function).
+#
+# This and add_alias_data() run for every function, so they use
+# attribute access on the records (see records.py) rather than the
+# slower dict-style access.
+def init_alias_data(alias_set):
+    alias_set.deprecated = None
+    alias_set.es1 = None
+    alias_set.exec = None
+    alias_set.glx = None
+    alias_set.es2 = None
+    alias_set.desktop = True
+    canonical_function = FUNCTIONS[alias_set.canonical_name]
+    alias_set.mesa_name = canonical_function.mesa_name
+    alias_set.offset = canonical_function.offset
+
+
+# Fold the properties of function into the aggregated properties of
+# alias_set, which it has just joined.
+def add_alias_data(alias_set, function):
+    for prop in CONSISTENT_PROPERTIES:
+        value = getattr(function, prop)
+        if value is not None:
+            current = getattr(alias_set, prop)
+            if current is None:
+                setattr(alias_set, prop, value)
+            elif current != value:
+                setattr(alias_set, prop, 'inconsistent')
+    es2 = function.es2
+    if es2 is not None:
+        if alias_set.es2 is None or es2 < alias_set.es2:
+            alias_set.es2 = es2
+    if not function.desktop:
+        alias_set.desktop = False
+
+
+# An alias_sets.AliasSetIndex whose alias sets also carry the
+# aggregated properties documented above, kept up to date as each
+# function joins a set.
+class AliasSetIndex(alias_sets.AliasSetIndex):
+    def new_alias_set(self, canonical_name):
+        alias_set = alias_sets.AliasSetIndex.new_alias_set(
+            self, canonical_name)
+        init_alias_data(alias_set)
+        return alias_set
+
+    def add_to_alias_set(self, alias_set, name):
+        alias_sets.AliasSetIndex.add_to_alias_set(self, alias_set, name)
+        add_alias_data(alias_set, FUNCTIONS[name])
+
+
+# Bring ALIAS_SETS and ALIAS_SETS_BY_FUNCTION up to date after adding
+# functions to (or removing them from) FUNCTIONS and ALIAS_SET_INDEX.
+# Only the alias sets that changed have their aggregated properties
+# recomputed; the others are left alone.
+def update_alias_sets():
+    global ALIAS_SETS, ALIAS_SETS_BY_FUNCTION
+    ALIAS_SETS, ALIAS_SETS_BY_FUNCTION = ALIAS_SET_INDEX.alias_sets()
+
+
+# Replace the definitions of the functions in functions (a map from
+# name to function, as in FUNCTIONS), or add them if they are new, and
+# update SIGNATURES and the alias sets to match (e.g. after reloading
+# part of the XML).  The tables derived from categories
+# (FUNCTIONS_BY_EXTENSION and friends) are left alone.
+def replace_functions(functions):
+    for name in functions:
+        if name in FUNCTIONS:
+            # Removing the old definition first puts the new one at the
+            # end of FUNCTIONS, in the same place as in ALIAS_SET_INDEX.
+            del FUNCTIONS[name]
+            ALIAS_SET_INDEX.remove(name)
+    for name, function in functions.items():
+        FUNCTIONS[name] = function
+        ALIAS_SET_INDEX.add(name, function['alias'])
+        SIGNATURES.forget(name)
+    update_alias_sets()
 
 
 def main():
-    global ALIAS_SETS, ALIAS_SETS_BY_FUNCTION, EXTENSIONS_BY_FUNCTION
-    xml_dir = '/home/pberry/mesa/src/mapi/glapi/gen'
-    xml_files = [file for file in os.listdir(xml_dir) if file.endswith('.xml')]
-    for file in xml_files:
-        tree = etree.parse(os.path.join(xml_dir, file))
-        assert tree.getroot().tag == 'OpenGLAPI'
-        process_OpenGLAPI(tree.getroot())
-    ALIAS_SETS, ALIAS_SETS_BY_FUNCTION = alias_sets.compute_alias_sets(
-        FUNCTIONS)
-    for alias_set in ALIAS_SETS:
-        collect_alias_data(alias_set)
-    EXTENSIONS_BY_FUNCTION = relation.invert(
-        FUNCTIONS_BY_EXTENSION, FUNCTIONS.keys())
+    global FUNCTIONS, FUNCTIONS_BY_EXTENSION, FUNCTION_BITSETS_BY_EXTENSION, \
+        EXTENSIONS_BY_FUNCTION, EXTENSION_FUNCTIONS, SIGNATURES, \
+        ALIAS_SET_INDEX, SOURCE_FILES
+    FUNCTIONS = {}
+    EXTENSION_FUNCTIONS = relation.Relation()
+    FUNCTIONS_BY_EXTENSION = EXTENSION_FUNCTIONS.by_key
+    EXTENSIONS_BY_FUNCTION = EXTENSION_FUNCTIONS.by_value
+    xml_dir = os.path.join(registry.MESA_DIR, 'src', 'mapi', 'glapi', 'gen')
+    root_xml_file = find_root_xml_file(xml_dir)
+    if root_xml_file is None:
+        SOURCE_FILES = load_xml_directory(xml_dir)
+    else:
+        SOURCE_FILES = load_xml_includes(root_xml_file)
+    ALIAS_SET_INDEX = AliasSetIndex()
+    for name, function in FUNCTIONS.items():
+        ALIAS_SET_INDEX.add(name, function['alias'])
+    update_alias_sets()
+    FUNCTION_BITSETS_BY_EXTENSION = bitsets.bitsets_by_key(
+        FUNCTIONS_BY_EXTENSION)
+    SIGNATURES = signature.SignatureTable(FUNCTIONS)
 
 
-main()
+__getattr__ = registry.lazy_tables(__name__, main, TABLES)
@@ -1,33 +1,58 @@
 import alias_sets
+import bitsets
 import glspec
 import gltm
+import records
+import registry
+import relation
+import signature
 
 
-# Same as glspec.py's FUNCTIONS hash, except with additional key/value
+# Tables loaded by main() the first time they are accessed (see
+# registry.py):
+#
+# FUNCTIONS: same as glspec.py's FUNCTIONS hash (as read-only views of
+# its entries; see FunctionView), except with additional key/value
 # pairs:
 # - 'return': C return type of the function
 #
 # And with additional key/value pairs for each function parameter:
 # - 'type': C type of the parameter
-FUNCTIONS = {}
-
-
-# Map from extension name to a list of functions defined by that
-# extension.  Gleaned from the "category" annotation.
-FUNCTIONS_BY_EXTENSION = {}
-
-
-# List of all function alias sets, each of which is a hash with
-# key/value pairs:
+#
+# FUNCTIONS_BY_EXTENSION: map from extension name to a tuple of
+# functions defined by that extension.  Gleaned from the "category"
+# annotation.
+#
+# EXTENSIONS_BY_FUNCTION: map from function name to a sorted tuple of
+# extensions that define it.
+#
+# EXTENSION_FUNCTIONS: the relation.Relation between extension names
+# and function names; FUNCTIONS_BY_EXTENSION and EXTENSIONS_BY_FUNCTION
+# are its two directions.
+#
+# FUNCTION_BITSETS_BY_EXTENSION: FUNCTIONS_BY_EXTENSION with each list
+# of functions converted to a bitset (see bitsets.py).
+#
+# SIGNATURES: map from function name to its normalized signature (a
+# signature.SignatureTable, which computes each one on first use, so
+# that loading the tables doesn't force every function's C types).
+#
+# ALIAS_SETS: list of all function alias sets, each of which is a hash
+# with key/value pairs:
 # - 'canonical_name': canonical function name for the alias set
 # - 'functions': list of names of functions in this alias set
 #                (includes the canonical name).
-ALIAS_SETS = []
-
-
-# Map from function name to the alias set containing it.  The alias
-# sets are the same objects as in the ALIAS_SETS list.
-ALIAS_SETS_BY_FUNCTION = {}
+#
+# ALIAS_SETS_BY_FUNCTION: map from function name to the alias set
+# containing it.  The alias sets are the same objects as in the
+# ALIAS_SETS list.
+#
+# SOURCE_FILES: list of the files the other tables were loaded from
+# (gl.spec and gl.tm).
+TABLES = ['FUNCTIONS', 'FUNCTIONS_BY_EXTENSION', 'EXTENSIONS_BY_FUNCTION',
+          'EXTENSION_FUNCTIONS', 'FUNCTION_BITSETS_BY_EXTENSION',
+          'SIGNATURES', 'ALIAS_SETS', 'ALIAS_SETS_BY_FUNCTION',
+          'SOURCE_FILES']
 
 
 # Function->extension mappings missing from gl.spec
@@ -96,18 +121,79 @@ FUNCTION_BY_EXTENSION_SUBTRACTIONS = {
     }
 
 
-def convert_function(func):
-    func = dict(func)
-    func['return'] = convert_type(func['abstract_return'], 'value', 'in')
-    func['params'] = [convert_param(p) for p in func['params']]
-    return func
+# opengl.FUNCTIONS entries are views over the glspec.FUNCTIONS records,
+# rather than copies of them: the C types are computed (through the
+# C_TYPES cache) the first time they're looked up, so until then the
+# only per-function memory this module adds is the view object itself.
+# 'return' and the list of ParamViews that 'params' gives are kept in
+# the view once computed, since callers look them up over and over.
+# Views behave like the glspec records (see records.py), with the extra
+# 'return' key.
+class FunctionView(records.DictMethods):
+    __slots__ = ('func', 'return_type', 'param_views')
 
+    def __init__(self, func):
+        self.func = func
+        self.return_type = None
+        self.param_views = None
 
-def convert_param(param):
-    param = dict(param)
-    param['type'] = convert_type(param['abstract_type'], param['pointer_type'],
-                                 param['direction'])
-    return param
+    def __getitem__(self, key):
+        if key == 'return':
+            if self.return_type is None:
+                self.return_type = c_type(self.func['abstract_return'],
+                                          'value', 'in')
+            return self.return_type
+        elif key == 'params':
+            if self.param_views is None:
+                self.param_views = [ParamView(param)
+                                    for param in self.func['params']]
+            return self.param_views
+        return self.func[key]
+
+    def __contains__(self, key):
+        return key == 'return' or key in self.func
+
+    def items(self):
+        items = [(key, self[key] if key == 'params' else value)
+                 for key, value in self.func.items()]
+        items.append(('return', self['return']))
+        return items
+
+
+class ParamView(records.DictMethods):
+    __slots__ = ('param', 'type')
+
+    def __init__(self, param):
+        self.param = param
+        self.type = c_type(param['abstract_type'], param['pointer_type'],
+                           param['direction'])
+
+    def __getitem__(self, key):
+        if key == 'type':
+            return self.type
+        return self.param[key]
+
+    def __contains__(self, key):
+        return key == 'type' or key in self.param
+
+    def items(self):
+        items = self.param.items()
+        items.append(('type', self['type']))
+        return items
+
+
+# Map from (abstract type, pointer type, direction) to the C type
+# computed by convert_type().  gl.spec only uses a few hundred
+# combinations, so this saves converting the same type over and over.
+C_TYPES = {}
+
+
+def c_type(type, pointer_type, direction):
+    key = (type, pointer_type, direction)
+    result = C_TYPES.get(key)
+    if result is None:
+        result = C_TYPES[key] = convert_type(type, pointer_type, direction)
+    return result
 
 
 def convert_type(type, pointer_type, direction):
@@ -136,30 +222,41 @@ def convert_type(type, pointer_type, direction):
 
 
 def add_func_to_extension(func_name, ext_name):
-    if ext_name not in FUNCTIONS_BY_EXTENSION:
-        FUNCTIONS_BY_EXTENSION[ext_name] = []
-    assert func_name not in FUNCTIONS_BY_EXTENSION[ext_name]
-    FUNCTIONS_BY_EXTENSION[ext_name].append(func_name)
+    assert not EXTENSION_FUNCTIONS.contains(ext_name, func_name)
+    EXTENSION_FUNCTIONS.add(ext_name, func_name)
 
 
 def remove_func_from_extension(func_name, ext_name):
-    assert func_name in FUNCTIONS_BY_EXTENSION[ext_name]
-    del FUNCTIONS_BY_EXTENSION[ext_name][
-        FUNCTIONS_BY_EXTENSION[ext_name].index(func_name)]
-
-
-for name, func in glspec.FUNCTIONS.items():
-    if not func['category'].startswith('VERSION_'):
-        add_func_to_extension(name, func['category'])
-    FUNCTIONS[name] = convert_function(func)
+    assert EXTENSION_FUNCTIONS.contains(ext_name, func_name)
+    EXTENSION_FUNCTIONS.remove(ext_name, func_name)
 
 
-for ext, funcs in FUNCTION_BY_EXTENSION_ADDITIONS.items():
-    for func in funcs:
-        add_func_to_extension(func, ext)
+def main():
+    global FUNCTIONS, FUNCTIONS_BY_EXTENSION, EXTENSIONS_BY_FUNCTION, \
+        EXTENSION_FUNCTIONS, FUNCTION_BITSETS_BY_EXTENSION, SIGNATURES, \
+        ALIAS_SETS, ALIAS_SETS_BY_FUNCTION, SOURCE_FILES
+    FUNCTIONS = {}
+    C_TYPES.clear()
+    EXTENSION_FUNCTIONS = relation.Relation()
+    FUNCTIONS_BY_EXTENSION = EXTENSION_FUNCTIONS.by_key
+    EXTENSIONS_BY_FUNCTION = EXTENSION_FUNCTIONS.by_value
+    for name, func in glspec.FUNCTIONS.items():
+        EXTENSION_FUNCTIONS.add_value(name)
+        if not func['category'].startswith('VERSION_'):
+            add_func_to_extension(name, func['category'])
+        FUNCTIONS[name] = FunctionView(func)
+    for ext, funcs in FUNCTION_BY_EXTENSION_ADDITIONS.items():
+        for func in funcs:
+            add_func_to_extension(func, ext)
+    for ext, funcs in FUNCTION_BY_EXTENSION_SUBTRACTIONS.items():
+        for func in funcs:
+            remove_func_from_extension(func, ext)
+    FUNCTION_BITSETS_BY_EXTENSION = bitsets.bitsets_by_key(
+        FUNCTIONS_BY_EXTENSION)
+    SIGNATURES = signature.SignatureTable(FUNCTIONS)
+    ALIAS_SETS, ALIAS_SETS_BY_FUNCTION = alias_sets.compute_alias_sets(
+        FUNCTIONS)
+    SOURCE_FILES = glspec.SOURCE_FILES + gltm.SOURCE_FILES
 
-for ext, funcs in FUNCTION_BY_EXTENSION_SUBTRACTIONS.items():
-    for func in funcs:
-        remove_func_from_extension(func, ext)
 
-ALIAS_SETS, ALIAS_SETS_BY_FUNCTION = alias_sets.compute_alias_sets(FUNCTIONS)
+__getattr__ = registry.lazy_tables(__name__, main, TABLES)
@@ -0,0 +1,28 @@
+# Helpers for spreading per-file parsing work across processes.
+
+import concurrent.futures
+import itertools
+import os
+
+
+def map_in_processes(function, items, jobs, args=()):
+    """Return [function(item, *args) for item in items], computed by up
+    to jobs worker processes (all available cores if jobs is 0).
+
+    function must be a module-level function, and its arguments and
+    results must be picklable.  The results are in the same order as
+    items regardless of which worker finishes first.
+
+    Workers don't see changes made to module globals after import
+    (depending on the multiprocessing start method), so any settings
+    that function depends on should be passed in args.
+    """
+    if jobs == 0:
+        jobs = os.cpu_count() or 1
+    jobs = min(jobs, len(items))
+    if jobs <= 1:
+        return [function(item, *args) for item in items]
+    with concurrent.futures.ProcessPoolExecutor(jobs) as executor:
+        return list(executor.map(function, items,
+                                 *[itertools.repeat(arg) for arg in args],
+                                 chunksize=max(1, len(items) // (jobs * 4))))
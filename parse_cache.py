@@ -0,0 +1,253 @@
+# A cache of parse results, stored on disk and shared by all the
+# loaders.
+#
+# Each entry is the pickled result of parsing a single file, keyed by
+# a hash of the file's contents together with the name and version of
+# the parser (and any other inputs that affect the result).  So a warm
+# run only re-parses the files that have changed since the last run.
+# A parser's version is a hash of its source code (see
+# source_version()), so changing the code invalidates all of its
+# entries.
+#
+# Entries are evicted least-recently-used first once the cache grows
+# beyond MAX_SIZE bytes.
+#
+# Configuration (environment variables, or assign to the globals
+# before the first lookup):
+# - OPENGL_API_CACHE=0 disables the cache (ENABLED).
+# - OPENGL_API_CACHE_DIR sets the cache directory (CACHE_DIR).
+# - OPENGL_API_CACHE_MAX_SIZE sets the maximum size in bytes
+#   (MAX_SIZE).
+# - OPENGL_API_CACHE_STATS=1 prints hit/miss counts to stderr at exit
+#   (REPORT_STATS).
+
+import atexit
+import gc
+import hashlib
+import os
+import os.path
+import parallel
+import pickle
+import sys
+
+
+ENABLED = os.environ.get('OPENGL_API_CACHE', '1') != '0'
+CACHE_DIR = os.environ.get(
+    'OPENGL_API_CACHE_DIR',
+    os.path.join(os.path.expanduser('~'), '.cache', 'opengl-api'))
+MAX_SIZE = int(os.environ.get('OPENGL_API_CACHE_MAX_SIZE', 256 * 1024 * 1024))
+REPORT_STATS = os.environ.get('OPENGL_API_CACHE_STATS', '0') != '0'
+
+
+# Counts of cache activity during this run.
+STATS = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+
+ENTRY_SUFFIX = '.pickle'
+
+
+# Total size of the entries in CACHE_DIR, or None if it hasn't been
+# measured yet.
+current_size = None
+
+
+# Map from a tuple of source file names to their source_version().
+SOURCE_VERSIONS = {}
+
+
+def source_version(*filenames):
+    """Return a hash of the given source files (e.g. __file__ of the
+    module implementing a parser, and of any modules whose code affects
+    its results), for use as a parser version.
+    """
+    version = SOURCE_VERSIONS.get(filenames)
+    if version is None:
+        h = hashlib.sha256()
+        for filename in filenames:
+            with open(filename, 'rb') as f:
+                h.update(f.read())
+        version = SOURCE_VERSIONS[filenames] = h.hexdigest()
+    return version
+
+
+def file_key(filename, parser, version, extra=()):
+    """Return the cache key for parsing filename with the given parser.
+
+    extra may contain any other (repr-able) inputs that affect the
+    parse result; it must have a deterministic repr.
+    """
+    h = hashlib.sha256()
+    h.update(repr((parser, version, extra)).encode('utf-8'))
+    with open(filename, 'rb') as f:
+        h.update(f.read())
+    return h.hexdigest()
+
+
+def data_key(parser, version, extra=()):
+    """Return the cache key for a value that the given parser computes
+    from extra alone, rather than from the contents of a file.
+    """
+    h = hashlib.sha256()
+    h.update(repr((parser, version, extra)).encode('utf-8'))
+    return h.hexdigest()
+
+
+def entry_path(key):
+    return os.path.join(CACHE_DIR, key + ENTRY_SUFFIX)
+
+
+def lookup(key):
+    """Return (True, value) if key is in the cache, (False, None)
+    otherwise.
+    """
+    path = entry_path(key)
+    # Unpickling allocates a lot of objects but creates no garbage, so
+    # don't let it trigger garbage collections.
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        with open(path, 'rb') as f:
+            value = pickle.load(f)
+    except Exception:
+        # Missing, truncated or otherwise unreadable entry.
+        STATS['misses'] += 1
+        return False, None
+    finally:
+        if gc_enabled:
+            gc.enable()
+    # Mark the entry as recently used.  (This fails if the cache
+    # directory is read-only, in which case eviction is moot anyway.)
+    try:
+        os.utime(path)
+    except OSError:
+        pass
+    STATS['hits'] += 1
+    return True, value
+
+
+# Store value in the cache under key.  Like lookup(), this is best
+# effort: if the cache directory can't be created or written (e.g. a
+# read-only home directory), the value just isn't cached.
+def store(key, value):
+    global current_size
+    path = entry_path(key)
+    tmp_path = '{0}.{1}.tmp'.format(path, os.getpid())
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if current_size is None:
+            current_size = sum(size for path, mtime, size in list_entries())
+        with open(tmp_path, 'wb') as f:
+            pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp_path, path)
+        current_size += os.path.getsize(path)
+    except OSError:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        return
+    if current_size > MAX_SIZE:
+        evict()
+
+
+def list_entries():
+    """Yield (path, mtime, size) for each entry in the cache."""
+    try:
+        names = os.listdir(CACHE_DIR)
+    except OSError:
+        return
+    for name in names:
+        if name.endswith(ENTRY_SUFFIX):
+            path = os.path.join(CACHE_DIR, name)
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            yield path, st.st_mtime, st.st_size
+
+
+def evict():
+    """Remove least-recently-used entries until the cache is no bigger
+    than 90% of MAX_SIZE (so that we don't have to evict again on the
+    very next store).
+    """
+    global current_size
+    entries = sorted(list_entries(), key=lambda entry: entry[1])
+    current_size = sum(size for path, mtime, size in entries)
+    target = MAX_SIZE * 9 // 10
+    for path, mtime, size in entries:
+        if current_size <= target:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        except OSError:
+            # Can't remove it (e.g. a read-only cache directory), so it
+            # still counts towards the size.
+            continue
+        current_size -= size
+        STATS['evictions'] += 1
+
+
+def cached(filename, parser, version, parse, extra=()):
+    """Return the result of calling parse(), which parses filename,
+    using the cache if possible.
+
+    See file_key() for the meaning of parser, version and extra.
+    """
+    if not ENABLED:
+        return parse()
+    key = file_key(filename, parser, version, extra)
+    found, value = lookup(key)
+    if not found:
+        value = parse()
+        store(key, value)
+    return value
+
+
+def cached_map(parse, filenames, parser, version, extras=None, jobs=1,
+               args=()):
+    """Return [parse(filename, *args) for filename in filenames], using
+    the cache if possible.
+
+    The files that miss the cache are parsed by up to jobs worker
+    processes (see parallel.map_in_processes()), so parse must be a
+    module-level function.  extras, if given, is a list containing the
+    extra key data (see file_key()) for each file; anything in args
+    that affects the results must be in it too.
+    """
+    if extras is None:
+        extras = [()] * len(filenames)
+    results = [None] * len(filenames)
+    keys = {}
+    misses = []
+    for i, (filename, extra) in enumerate(zip(filenames, extras)):
+        if ENABLED:
+            key = file_key(filename, parser, version, extra)
+            found, value = lookup(key)
+            if found:
+                results[i] = value
+                continue
+            keys[i] = key
+        misses.append(i)
+    values = parallel.map_in_processes(
+        parse, [filenames[i] for i in misses], jobs, args)
+    for i, value in zip(misses, values):
+        results[i] = value
+        if ENABLED:
+            store(keys[i], value)
+    return results
+
+
+def format_stats():
+    return 'parse cache: {0} hits, {1} misses, {2} evictions'.format(
+        STATS['hits'], STATS['misses'], STATS['evictions'])
+
+
+def report_stats():
+    if REPORT_STATS and (STATS['hits'] or STATS['misses']):
+        print(format_stats(), file=sys.stderr)
+
+
+atexit.register(report_stats)
@@ -0,0 +1,230 @@
+# Compact record types for the entries of the loaders' tables.
+#
+# There are tens of thousands of functions and parameters, and they all
+# have the same handful of keys, so storing each one as a dict (with
+# its own hash table) wastes a lot of memory.  Instead each kind of
+# entry has a record class with a __slots__ entry per field.  Records
+# still behave like dicts (r['name'], r.get('array_size'), 'alias' in
+# r, r.items(), dict(r), == against a dict...), so code written for the
+# dicts works unchanged.
+#
+# A field that was never given a value is absent, just like a missing
+# dict key: e.g. 'array_size' in param is False unless the parameter is
+# an array.  Giving a value to a key that isn't one of the fields
+# raises KeyError.
+#
+# Fields can also be read as attributes (r.offset, getattr(r,
+# 'return')), which is quicker than r['offset'] in hot loops; an absent
+# field raises AttributeError.
+#
+# There are two kinds of record:
+# - Record: immutable, and used for functions and parameters (which go
+#   through parse_cache).  replace() returns a modified copy.
+# - MutableRecord: also supports r[key] = value (and attribute
+#   assignment).  Used for alias sets, whose aggregated properties are
+#   updated in place.
+
+
+# Value of an absent field.  Pickled by reference, so that it is still
+# the same object after a round trip through parse_cache.
+class Absent(object):
+    def __repr__(self):
+        return 'ABSENT'
+
+    def __reduce__(self):
+        return 'ABSENT'
+
+ABSENT = Absent()
+
+
+# Return the items of a mapping given as for dict(*args, **kwargs).  A
+# record is read directly rather than through a dict.
+def record_items(args, kwargs):
+    if len(args) == 1 and not kwargs and isinstance(args[0], DictMethods):
+        return args[0].items()
+    return dict(*args, **kwargs).items()
+
+
+# The read-only dict methods shared by Record and MutableRecord (and
+# the views in opengl.py), in terms of items(), __getitem__() and
+# __contains__(), which subclasses define.  __contains__() must not
+# compute the value, so that an exception raised while computing it
+# (even a KeyError) propagates from get() rather than being mistaken
+# for an absent key.
+class DictMethods(object):
+    __slots__ = ()
+
+    def get(self, key, default=None):
+        if key not in self:
+            return default
+        return self[key]
+
+    def keys(self):
+        return [key for key, value in self.items()]
+
+    def values(self):
+        return [value for key, value in self.items()]
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.items())
+
+    # Like dict.copy(), return a (shallow) dict with the same items.
+    def copy(self):
+        return dict(self.items())
+
+    def __eq__(self, other):
+        if isinstance(other, (DictMethods, dict)):
+            return dict(self.items()) == dict(other.items())
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return '{0}({1!r})'.format(type(self).__name__, dict(self.items()))
+
+
+# Return a record of class cls whose fields have the given values (see
+# Record.from_values()).  Records are pickled as a call to this.
+def make_record(cls, *values):
+    record = object.__new__(cls)
+    for setter, value in zip(cls.SETTERS, values):
+        if value is not ABSENT:
+            setter(record, value)
+    return record
+
+
+# Subclasses set __slots__ to the tuple of field names.
+class Record(DictMethods):
+    __slots__ = ()
+    KEYS = frozenset()
+    SETTERS = ()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls.KEYS = frozenset(cls.__slots__)
+        # The slot descriptors' __set__ methods, which bypass
+        # __setattr__ (so they work on immutable records too).
+        cls.SETTERS = tuple(getattr(cls, field).__set__
+                            for field in cls.__slots__)
+
+    def __init__(self, *args, **kwargs):
+        if not args and not kwargs:
+            return
+        items = kwargs.items() if not args else record_items(args, kwargs)
+        setters = dict(zip(self.__slots__, self.SETTERS))
+        for key, value in items:
+            if key not in setters:
+                raise KeyError(key)
+            setters[key](self, value)
+
+    # Return a record whose fields have the given values, in the order
+    # of __slots__ (with ABSENT for an absent field).  Quicker than
+    # going through a dict, for the loaders' inner loops.
+    @classmethod
+    def from_values(cls, *values):
+        if len(values) != len(cls.__slots__):
+            raise Exception('{0} takes {1} values, not {2}'.format(
+                    cls.__name__, len(cls.__slots__), len(values)))
+        return make_record(cls, *values)
+
+    def __setattr__(self, name, value):
+        raise AttributeError('{0} is immutable'.format(type(self).__name__))
+
+    def __delattr__(self, name):
+        raise AttributeError('{0} is immutable'.format(type(self).__name__))
+
+    def __getitem__(self, key):
+        if key in self.KEYS:
+            value = getattr(self, key, ABSENT)
+            if value is not ABSENT:
+                return value
+        raise KeyError(key)
+
+    def __contains__(self, key):
+        return key in self.KEYS and getattr(self, key, ABSENT) is not ABSENT
+
+    def items(self):
+        items = []
+        for key in self.__slots__:
+            value = getattr(self, key, ABSENT)
+            if value is not ABSENT:
+                items.append((key, value))
+        return items
+
+    # Return the values of the fields, in the order of __slots__ (with
+    # ABSENT for an absent field).
+    def values_in_order(self):
+        return [getattr(self, key, ABSENT) for key in self.__slots__]
+
+    # Return a copy of this record with the given keys (as for
+    # dict.update()) replaced.
+    def replace(self, *args, **kwargs):
+        values = self.values_in_order()
+        for key, value in record_items(args, kwargs):
+            if key not in self.KEYS:
+                raise KeyError(key)
+            values[self.__slots__.index(key)] = value
+        return make_record(type(self), *values)
+
+    def __reduce__(self):
+        return (make_record, (type(self),) + tuple(self.values_in_order()))
+
+
+# A Record whose fields can also be set (r[key] = value, or as
+# attributes) and deleted.
+class MutableRecord(Record):
+    __slots__ = ()
+
+    __setattr__ = object.__setattr__
+    __delattr__ = object.__delattr__
+
+    def __setitem__(self, key, value):
+        if key not in self.KEYS:
+            raise KeyError(key)
+        setattr(self, key, value)
+
+    def __delitem__(self, key):
+        if key not in self:
+            raise KeyError(key)
+        delattr(self, key)
+
+
+# An entry in glspec.FUNCTIONS.  See glspec.py for the meaning of the
+# keys.  (opengl.py adds 'return' through a view; see FunctionView.)
+class SpecFunction(Record):
+    __slots__ = ('abstract_return', 'params', 'deprecated', 'category',
+                 'subcategory', 'alias')
+
+
+# A parameter of a SpecFunction.  (opengl.py adds 'type' through a
+# view; see ParamView.)
+class SpecParam(Record):
+    __slots__ = ('name', 'abstract_type', 'direction', 'pointer_type',
+                 'array_size', 'array_retained')
+
+
+# An entry in mesa.FUNCTIONS.  See mesa.py for the meaning of the keys.
+class MesaFunction(Record):
+    __slots__ = ('return', 'params', 'alias', 'desktop', 'mesa_name',
+                 'offset', 'glx', 'deprecated', 'es1', 'es2', 'exec')
+
+
+# A parameter of a MesaFunction.
+class MesaParam(Record):
+    __slots__ = ('type', 'name')
+
+
+# An entry in ALIAS_SETS.  opengl.py only sets 'canonical_name' and
+# 'functions'; mesa.py also sets the aggregated properties.
+class AliasSet(MutableRecord):
+    __slots__ = ('canonical_name', 'functions', 'deprecated', 'es1', 'exec',
+                 'glx', 'es2', 'desktop', 'mesa_name', 'offset')
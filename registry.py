@@ -0,0 +1,60 @@
+# Configuration shared by the loaders (glspec.py, gltm.py, mesa.py,
+# extensions.py, opengl.py and api_exec.py), and the machinery that
+# lets them load their tables lazily.
+#
+# None of the loaders parses anything at import time.  Instead, the
+# first access to one of a loader's tables (e.g. mesa.FUNCTIONS) runs
+# that loader's main(), which reads its sources from the roots below.
+# So a script that only looks at opengl.FUNCTIONS_BY_EXTENSION never
+# touches the Mesa tree.
+#
+# To point the loaders at different trees (or change other settings),
+# either set the environment variables, or assign to these globals
+# before the first table is accessed.
+
+import os
+import sys
+
+
+# Root of a copy of the OpenGL registry (the directory containing
+# api/gl.spec and specs/<vendor>/*.txt).
+OPENGL_REGISTRY_DIR = os.environ.get(
+    'OPENGL_REGISTRY_DIR', '/home/pberry/opengl-docs/www.opengl.org/registry')
+
+
+# Root of a Mesa source tree.
+MESA_DIR = os.environ.get('MESA_DIR', '/home/pberry/mesa')
+
+
+# Number of worker processes the loaders may use to parse files in
+# parallel.  1 means parse everything in this process; 0 means use all
+# available cores.
+JOBS = int(os.environ.get('OPENGL_API_JOBS', '1'))
+
+
+def lazy_tables(module_name, load, table_names):
+    """Return a module-level __getattr__ function that runs load() the
+    first time any of the names in table_names is looked up in the
+    given module.
+
+    load() is expected to assign every one of table_names as a module
+    global; after that, lookups no longer go through __getattr__.  If
+    load() raises an exception, the tables it had already assigned are
+    removed again, so that the next lookup retries the whole load
+    rather than seeing a half-loaded module.
+    """
+    table_names = frozenset(table_names)
+    def getattr_(name):
+        if name not in table_names:
+            raise AttributeError('module {0!r} has no attribute {1!r}'.format(
+                    module_name, name))
+        module_dict = sys.modules[module_name].__dict__
+        if name not in module_dict:
+            try:
+                load()
+            except:
+                for table_name in table_names:
+                    module_dict.pop(table_name, None)
+                raise
+        return module_dict[name]
+    return getattr_
@@ -1,20 +1,97 @@
-def invert(rel, extra_keys = None):
-    """Invert the relation represented by a map from X to a list of Y.
+import collections.abc
 
-    This function returns a new map, from Y to a list of X, such that:
-    (x in invert(rel)[y]) == (y in rel[x])
 
-    If extra_keys is specified, then each key it contains is
-    guaranteed to appear in the resulting map, even if it maps to the
-    empty list.
+class Relation(object):
+    """A many-to-many relation between keys and values (e.g. extensions
+    and the functions they define), indexed in both directions.
+
+    Adding, removing and testing a (key, value) pair are all O(1), and
+    both directions are always in sync, so the inverse never has to be
+    recomputed.
+
+    by_key and by_value are read-only mappings from each key to a tuple
+    of its values and from each value to a tuple of its keys.  Each
+    key's values are in the order they were added; each value's keys
+    are sorted (which is the order the relation's inverse was always
+    computed in).
+    """
+
+    def __init__(self):
+        # Map from key to an ordered set (a dict whose values are None)
+        # of its values, and vice versa.
+        self.values_by_key = {}
+        self.keys_by_value = {}
+        self.by_key = RelationView(self.values_by_key, False)
+        self.by_value = RelationView(self.keys_by_value, True)
+
+    def add_key(self, key):
+        """Make sure key appears in by_key, even if it has no values."""
+        if key not in self.values_by_key:
+            self.values_by_key[key] = {}
+
+    def add_value(self, value):
+        """Make sure value appears in by_value, even if it has no keys."""
+        if value not in self.keys_by_value:
+            self.keys_by_value[value] = {}
+
+    def add(self, key, value):
+        self.add_key(key)
+        self.add_value(value)
+        self.values_by_key[key][value] = None
+        self.keys_by_value[value][key] = None
+        self.by_key.changed(key)
+        self.by_value.changed(value)
+
+    def remove(self, key, value):
+        """Remove the pair (key, value), which must be present.  key and
+        value themselves stay in by_key and by_value.
+        """
+        if not self.contains(key, value):
+            raise KeyError((key, value))
+        del self.values_by_key[key][value]
+        del self.keys_by_value[value][key]
+        self.by_key.changed(key)
+        self.by_value.changed(value)
+
+    def contains(self, key, value):
+        return value in self.values_by_key.get(key, ())
+
+
+class RelationView(collections.abc.Mapping):
+    """One direction of a Relation.  Looking up an entry returns a
+    tuple, which is built the first time and then reused until the
+    entry changes, so repeated lookups are O(1).  If sort is true, the
+    tuple is sorted.
     """
-    result = {}
-    for key in sorted(rel.keys()):
-        for value in rel[key]:
-            if value not in result:
-                result[value] = []
-            result[value].append(key)
-    for key in extra_keys:
-        if key not in result:
-            result[key] = []
-    return result
+
+    def __init__(self, sets, sort):
+        self.sets = sets
+        self.sort = sort
+        # Map from key to the tuple last returned for it.
+        self.tuples = {}
+
+    # Forget the tuple for key, after its set has changed.
+    def changed(self, key):
+        self.tuples.pop(key, None)
+
+    def __getitem__(self, key):
+        result = self.tuples.get(key)
+        if result is None:
+            if self.sort:
+                result = tuple(sorted(self.sets[key]))
+            else:
+                result = tuple(self.sets[key])
+            self.tuples[key] = result
+        return result
+
+    def __contains__(self, key):
+        return key in self.sets
+
+    def __iter__(self):
+        return iter(self.sets)
+
+    def __len__(self):
+        return len(self.sets)
+
+    def __repr__(self):
+        return repr(dict(self.items()))
@@ -0,0 +1,94 @@
+# Normalized function signatures, for comparing functions across
+# sources (e.g. mesa.py and opengl.py) that spell the same C types
+# differently.
+#
+# A signature is a tuple (return type, tuple of parameter types), with
+# every type normalized by normalize_type().  Signatures are
+# hash-consed: signature() always returns the same object for equal
+# signatures, so two functions have equivalent signatures iff their
+# signatures are identical (sig1 is sig2).
+
+import collections.abc
+import sys
+
+
+# Types that are considered the same when comparing signatures.
+TYPE_EQUIVALENCES = {
+    'GLclampf': 'GLfloat',
+    'GLchar': 'char',
+    'GLcharARB': 'char',
+    'GLsizei': 'GLint',
+    'GLclampd': 'GLdouble',
+    'GLhandleARB': 'GLuint',
+    'GLbitfield': 'GLenum',
+    'GLvoid': 'void',
+    }
+
+
+# Map from C type to its (interned) normalized form.
+NORMALIZED_TYPES = {}
+
+
+# Map from each signature to its canonical object.
+SIGNATURES = {}
+
+
+def normalize_type(type):
+    result = NORMALIZED_TYPES.get(type)
+    if result is None:
+        type_parts = type.replace('*', ' * ').split()
+        type_parts = [TYPE_EQUIVALENCES.get(p, p) for p in type_parts]
+        result = NORMALIZED_TYPES[type] = sys.intern(' '.join(type_parts))
+    return result
+
+
+def signature(return_type, param_types):
+    sig = (normalize_type(return_type),
+           tuple(normalize_type(type) for type in param_types))
+    return SIGNATURES.setdefault(sig, sig)
+
+
+# Return the signature of a function in a loader's FUNCTIONS table.
+def function_signature(func):
+    return signature(func['return'], [p['type'] for p in func['params']])
+
+
+# Return a map from function name to signature for a FUNCTIONS table.
+def signatures(functions):
+    return dict((name, function_signature(func))
+                for name, func in functions.items())
+
+
+class SignatureTable(collections.abc.Mapping):
+    """A map from function name to signature for a FUNCTIONS table,
+    like signatures(functions), except that each signature is only
+    computed (and memoized) the first time it is looked up.  So
+    building the table costs nothing, and e.g. opengl.py's C types are
+    only worked out for the functions whose signatures are used.
+
+    The table follows functions as it changes, except that forget(name)
+    must be called when a function that has been looked up is
+    replaced.
+    """
+
+    def __init__(self, functions):
+        self.functions = functions
+        self.cache = {}
+
+    def __getitem__(self, name):
+        sig = self.cache.get(name)
+        if sig is None:
+            sig = self.cache[name] = function_signature(self.functions[name])
+        return sig
+
+    def forget(self, name):
+        self.cache.pop(name, None)
+
+    def __contains__(self, name):
+        return name in self.functions
+
+    def __iter__(self):
+        return iter(self.functions)
+
+    def __len__(self):
+        return len(self.functions)
@@ -0,0 +1,474 @@
+# Compact binary snapshots of a loaded model (the FUNCTIONS,
+# FUNCTIONS_BY_EXTENSION and ALIAS_SETS tables of mesa.py or
+# opengl.py), which can be memory-mapped and queried without
+# deserializing the whole thing.
+#
+# To write a snapshot:
+#
+#     python snapshot.py mesa mesa.snapshot
+#
+# To read one:
+#
+#     snap = snapshot.Snapshot('mesa.snapshot')
+#     snap.FUNCTIONS['Clear']['params']
+#
+# A snapshot records a hash of each of the source files (the loader's
+# SOURCE_FILES table) that the model was loaded from, and Snapshot()
+# raises an exception if any of them has changed since.
+# open_snapshot() instead rewrites a missing or stale snapshot from the
+# loader before opening it, so a tool can just do:
+#
+#     snap = snapshot.open_snapshot('mesa', 'mesa.snapshot')
+#
+# Snapshot.FUNCTIONS, FUNCTIONS_BY_EXTENSION, ALIAS_SETS and
+# ALIAS_SETS_BY_FUNCTION behave like (read-only versions of) the
+# corresponding module tables, except that every lookup decodes a
+# fresh copy of the record, so alias sets obtained through different
+# lookups are equal but not identical.
+#
+# File layout (all integers are little-endian uint32):
+#
+#     header: magic, then the offset and count of each section
+#     strings: offsets array (count + 1 entries), then UTF-8 data
+#     function_fields, param_fields, alias_set_fields: string indices
+#         naming the fields stored in each kind of record
+#     functions: sorted by name; name, one value per function field,
+#         first param, param count, alias set index
+#     params: one value per param field
+#     alias_sets: one value per alias set field, first member, member
+#         count
+#     alias_set_members: function indices
+#     extensions: sorted by name; name, first member, member count
+#     extension_members: string indices of function names
+#     sources: path, then hex SHA-256 of its contents, for each source
+#         file (both string indices)
+#
+# A value is a string index, or one of the VALUE_* constants below.
+
+import collections.abc
+import hashlib
+import importlib
+import mmap
+import os
+import os.path
+import struct
+import sys
+
+
+MAGIC = b'GLAPISN2'
+
+VALUE_NONE = 0xffffffff
+VALUE_FALSE = 0xfffffffe
+VALUE_TRUE = 0xfffffffd
+VALUE_EMPTY_DICT = 0xfffffffc
+# The record has no such key (e.g. 'array_size' on a non-array param).
+VALUE_ABSENT = 0xfffffffb
+
+SECTIONS = ('strings', 'function_fields', 'param_fields', 'alias_set_fields',
+            'functions', 'params', 'alias_sets', 'alias_set_members',
+            'extensions', 'extension_members', 'sources')
+
+HEADER = struct.Struct('<8s' + 'II' * len(SECTIONS))
+WORD = struct.Struct('<I')
+
+
+class StringTable(object):
+    def __init__(self):
+        self.strings = []
+        self.indices = {}
+
+    def add(self, s):
+        if s not in self.indices:
+            self.indices[s] = len(self.strings)
+            self.strings.append(s)
+        return self.indices[s]
+
+    def encode_value(self, value):
+        if value is None:
+            return VALUE_NONE
+        elif value is False:
+            return VALUE_FALSE
+        elif value is True:
+            return VALUE_TRUE
+        elif value == {}:
+            return VALUE_EMPTY_DICT
+        elif isinstance(value, str):
+            return self.add(value)
+        raise Exception('Cannot store {0!r} in a snapshot'.format(value))
+
+
+def encode_record(strings, record, fields):
+    return [strings.encode_value(record[field]) if field in record
+            else VALUE_ABSENT for field in fields]
+
+
+def pack_words(words):
+    return struct.pack('<{0}I'.format(len(words)), *words)
+
+
+# Return the hex SHA-256 of the contents of the file at path, or None if
+# it can't be read.
+def file_digest(path):
+    try:
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except OSError:
+        return None
+
+
+def write_snapshot(filename, functions, functions_by_extension, alias_sets,
+                   source_files=()):
+    strings = StringTable()
+    function_names = sorted(functions.keys())
+    function_indices = dict((name, i) for i, name in enumerate(function_names))
+    function_fields = sorted(set(
+            key for func in functions.values() for key in func.keys()
+            if key != 'params'))
+    param_fields = sorted(set(
+            key for func in functions.values() for param in func['params']
+            for key in param.keys()))
+    alias_set_fields = sorted(set(
+            key for alias_set in alias_sets for key in alias_set.keys()
+            if key != 'functions'))
+    alias_set_indices = {}
+    alias_set_words = []
+    alias_set_member_words = []
+    for i, alias_set in enumerate(alias_sets):
+        alias_set_words.extend(
+            encode_record(strings, alias_set, alias_set_fields))
+        alias_set_words.append(len(alias_set_member_words))
+        alias_set_words.append(len(alias_set['functions']))
+        for name in alias_set['functions']:
+            alias_set_indices[name] = i
+            alias_set_member_words.append(function_indices[name])
+    function_words = []
+    param_words = []
+    num_params = 0
+    for name in function_names:
+        func = functions[name]
+        function_words.append(strings.add(name))
+        function_words.extend(encode_record(strings, func, function_fields))
+        function_words.append(num_params)
+        function_words.append(len(func['params']))
+        function_words.append(alias_set_indices.get(name, VALUE_NONE))
+        for param in func['params']:
+            param_words.extend(encode_record(strings, param, param_fields))
+            num_params += 1
+    extension_words = []
+    extension_member_words = []
+    for ext in sorted(functions_by_extension.keys()):
+        funcs = functions_by_extension[ext]
+        extension_words.append(strings.add(ext))
+        extension_words.append(len(extension_member_words))
+        extension_words.append(len(funcs))
+        extension_member_words.extend(strings.add(func) for func in funcs)
+    source_words = []
+    for path in source_files:
+        digest = file_digest(path)
+        if digest is None:
+            raise Exception('Cannot read source file {0}'.format(path))
+        source_words.append(strings.add(os.path.abspath(path)))
+        source_words.append(strings.add(digest))
+    field_words = [[strings.add(field) for field in fields]
+                   for fields in (function_fields, param_fields,
+                                  alias_set_fields)]
+    encoded_strings = [s.encode('utf-8') for s in strings.strings]
+    string_offsets = [0]
+    for s in encoded_strings:
+        string_offsets.append(string_offsets[-1] + len(s))
+    sections = [
+        (len(strings.strings),
+         pack_words(string_offsets) + b''.join(encoded_strings)),
+        (len(function_fields), pack_words(field_words[0])),
+        (len(param_fields), pack_words(field_words[1])),
+        (len(alias_set_fields), pack_words(field_words[2])),
+        (len(function_names), pack_words(function_words)),
+        (num_params, pack_words(param_words)),
+        (len(alias_sets), pack_words(alias_set_words)),
+        (len(alias_set_member_words), pack_words(alias_set_member_words)),
+        (len(functions_by_extension), pack_words(extension_words)),
+        (len(extension_member_words), pack_words(extension_member_words)),
+        (len(source_files), pack_words(source_words)),
+        ]
+    header_fields = []
+    offset = HEADER.size
+    for count, data in sections:
+        header_fields.extend([offset, count])
+        # Keep every section word-aligned.
+        offset += (len(data) + 3) & ~3
+    # Write to a temporary file first, so that a process that has the
+    # old snapshot mapped keeps seeing it whole.
+    tmp_filename = '{0}.{1}.tmp'.format(filename, os.getpid())
+    with open(tmp_filename, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, *header_fields))
+        for count, data in sections:
+            f.write(data)
+            f.write(b'\0' * (-len(data) & 3))
+    os.replace(tmp_filename, filename)
+
+
+class Snapshot(object):
+    # If check_sources is true, raise an exception if any of the source
+    # files the snapshot was written from has changed (see
+    # changed_source()).
+    def __init__(self, filename, check_sources=True):
+        with open(filename, 'rb') as f:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if len(self.data) < HEADER.size or \
+                HEADER.unpack_from(self.data, 0)[0] != MAGIC:
+            self.close()
+            raise Exception('{0} is not a snapshot file (or is from an '
+                            'older version of snapshot.py)'.format(filename))
+        header = HEADER.unpack_from(self.data, 0)
+        self.offsets = {}
+        self.counts = {}
+        for i, section in enumerate(SECTIONS):
+            self.offsets[section] = header[1 + 2 * i]
+            self.counts[section] = header[2 + 2 * i]
+        self.string_data_offset = self.offsets['strings'] + \
+            4 * (self.counts['strings'] + 1)
+        self.function_fields = self.read_fields('function_fields')
+        self.param_fields = self.read_fields('param_fields')
+        self.alias_set_fields = self.read_fields('alias_set_fields')
+        # Record sizes, in words.
+        self.function_size = len(self.function_fields) + 4
+        self.param_size = len(self.param_fields)
+        self.alias_set_size = len(self.alias_set_fields) + 2
+        self.FUNCTIONS = FunctionsView(self)
+        self.FUNCTIONS_BY_EXTENSION = ExtensionsView(self)
+        self.ALIAS_SETS = AliasSetsView(self)
+        self.ALIAS_SETS_BY_FUNCTION = AliasSetsByFunctionView(self)
+        if check_sources:
+            changed = self.changed_source()
+            if changed is not None:
+                self.close()
+                raise Exception(
+                    'Snapshot {0} is stale: {1} has changed since it was '
+                    'written'.format(filename, changed))
+
+    def close(self):
+        self.data.close()
+
+    def source_files(self):
+        """Return a list of (path, digest) for the source files the
+        snapshot was written from.
+        """
+        words = self.words('sources', 0, 2 * self.counts['sources'])
+        return [(self.string(words[i]), self.string(words[i + 1]))
+                for i in range(0, len(words), 2)]
+
+    def changed_source(self):
+        """Return the path of the first source file whose contents no
+        longer match the snapshot, or None if they all do.
+        """
+        for path, digest in self.source_files():
+            if file_digest(path) != digest:
+                return path
+        return None
+
+    def word(self, section, index):
+        return WORD.unpack_from(self.data,
+                                self.offsets[section] + 4 * index)[0]
+
+    def words(self, section, index, count):
+        return struct.unpack_from('<{0}I'.format(count), self.data,
+                                  self.offsets[section] + 4 * index)
+
+    def string(self, index):
+        start, end = self.words('strings', index, 2)
+        return self.data[self.string_data_offset + start:
+                         self.string_data_offset + end].decode('utf-8')
+
+    def read_fields(self, section):
+        return [self.string(i)
+                for i in self.words(section, 0, self.counts[section])]
+
+    def decode_record(self, words, fields):
+        record = {}
+        for field, value in zip(fields, words):
+            if value == VALUE_ABSENT:
+                continue
+            elif value == VALUE_NONE:
+                record[field] = None
+            elif value == VALUE_FALSE:
+                record[field] = False
+            elif value == VALUE_TRUE:
+                record[field] = True
+            elif value == VALUE_EMPTY_DICT:
+                record[field] = {}
+            else:
+                record[field] = self.string(value)
+        return record
+
+    def function_name(self, i):
+        return self.string(self.word('functions', i * self.function_size))
+
+    def find_function(self, name):
+        """Return the index of the function with the given name, or
+        None.
+        """
+        lo = 0
+        hi = self.counts['functions']
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_name = self.function_name(mid)
+            if mid_name == name:
+                return mid
+            elif mid_name < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def function(self, i):
+        words = self.words('functions', i * self.function_size,
+                           self.function_size)
+        func = self.decode_record(words[1:-3], self.function_fields)
+        params_start, params_count = words[-3:-1]
+        func['params'] = [
+            self.decode_record(
+                self.words('params', (params_start + j) * self.param_size,
+                           self.param_size),
+                self.param_fields)
+            for j in range(params_count)]
+        return func
+
+    def function_alias_set_index(self, i):
+        return self.word('functions', (i + 1) * self.function_size - 1)
+
+    def alias_set(self, i):
+        words = self.words('alias_sets', i * self.alias_set_size,
+                           self.alias_set_size)
+        alias_set = self.decode_record(words[:-2], self.alias_set_fields)
+        members_start, members_count = words[-2:]
+        alias_set['functions'] = [
+            self.function_name(j)
+            for j in self.words('alias_set_members', members_start,
+                                members_count)]
+        return alias_set
+
+    def extension_name(self, i):
+        return self.string(self.word('extensions', i * 3))
+
+    def find_extension(self, name):
+        lo = 0
+        hi = self.counts['extensions']
+        while lo < hi:
+            mid = (lo + hi) // 2
+            mid_name = self.extension_name(mid)
+            if mid_name == name:
+                return mid
+            elif mid_name < name:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def extension_functions(self, i):
+        name, members_start, members_count = self.words('extensions', i * 3, 3)
+        return [self.string(j)
+                for j in self.words('extension_members', members_start,
+                                    members_count)]
+
+
+class FunctionsView(collections.abc.Mapping):
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, name):
+        i = self.snapshot.find_function(name)
+        if i is None:
+            raise KeyError(name)
+        return self.snapshot.function(i)
+
+    def __contains__(self, name):
+        return self.snapshot.find_function(name) is not None
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.snapshot.function_name(i)
+
+    def __len__(self):
+        return self.snapshot.counts['functions']
+
+
+class ExtensionsView(collections.abc.Mapping):
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, name):
+        i = self.snapshot.find_extension(name)
+        if i is None:
+            raise KeyError(name)
+        return self.snapshot.extension_functions(i)
+
+    def __contains__(self, name):
+        return self.snapshot.find_extension(name) is not None
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self.snapshot.extension_name(i)
+
+    def __len__(self):
+        return self.snapshot.counts['extensions']
+
+
+class AliasSetsView(collections.abc.Sequence):
+    def __init__(self, snapshot):
+        self.snapshot = snapshot
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return [self[j] for j in range(*i.indices(len(self)))]
+        if i < 0:
+            i += len(self)
+        if not 0 <= i < len(self):
+            raise IndexError(i)
+        return self.snapshot.alias_set(i)
+
+    def __len__(self):
+        return self.snapshot.counts['alias_sets']
+
+
+class AliasSetsByFunctionView(FunctionsView):
+    def __getitem__(self, name):
+        i = self.snapshot.find_function(name)
+        if i is None:
+            raise KeyError(name)
+        alias_set_index = self.snapshot.function_alias_set_index(i)
+        if alias_set_index == VALUE_NONE:
+            raise KeyError(name)
+        return self.snapshot.alias_set(alias_set_index)
+
+
+# Write a snapshot of the tables of the loader module with the given
+# name (e.g. 'mesa') to filename.
+def write_module_snapshot(module_name, filename):
+    module = importlib.import_module(module_name)
+    write_snapshot(filename, module.FUNCTIONS, module.FUNCTIONS_BY_EXTENSION,
+                   module.ALIAS_SETS, module.SOURCE_FILES)
+
+
+# Return a Snapshot of the tables of the loader module with the given
+# name, read from filename.  If filename is missing, isn't a snapshot
+# or is stale, the module's tables are loaded and written to it first.
+def open_snapshot(module_name, filename):
+    if os.path.exists(filename):
+        try:
+            snap = Snapshot(filename, check_sources=False)
+        except Exception:
+            snap = None
+        if snap is not None:
+            if snap.changed_source() is None:
+                return snap
+            snap.close()
+    write_module_snapshot(module_name, filename)
+    return Snapshot(filename)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print('Usage: {0} mesa|opengl OUTPUT'.format(sys.argv[0]),
+              file=sys.stderr)
+        sys.exit(1)
+    write_module_snapshot(sys.argv[1], sys.argv[2])
@@ -1,5 +1,7 @@
 import hashcomments
+import parse_cache
 import re
+import records
 
 
 # Parse a gl.spec file, performing the given corrections along the
@@ -11,6 +13,22 @@ def parse_spec_file(filename,
                     functions_missing_deprecation = {},
                     functions_erroneously_deprecated = {},
                     function_alias_fixes = {}):
+    corrections = (sorted(functions_missing_deprecation.items()),
+                   sorted(functions_erroneously_deprecated),
+                   sorted(function_alias_fixes.items()))
+    version = parse_cache.source_version(__file__, hashcomments.__file__,
+                                         records.__file__)
+    return parse_cache.cached(
+        filename, 'spec_file', version,
+        lambda: read_spec_file(filename, functions_missing_deprecation,
+                               functions_erroneously_deprecated,
+                               function_alias_fixes),
+        corrections)
+
+
+# Same as parse_spec_file(), but bypassing the cache.
+def read_spec_file(filename, functions_missing_deprecation,
+                   functions_erroneously_deprecated, function_alias_fixes):
     functions = {}
     with open(filename, 'r') as f:
         for func in group_functions(f):
@@ -55,9 +73,10 @@ def parse_spec_file(filename,
             assert all(param_infos)
             params = [decode_param(name, type)
                       for name, type in zip(param_names, param_infos)]
-            functions[name] = {'abstract_return': return_type, 'params': params,
-                               'deprecated': deprecated, 'category': category,
-                               'subcategory': subcategory, 'alias': alias}
+            functions[name] = records.SpecFunction(
+                abstract_return=return_type, params=params,
+                deprecated=deprecated, category=category,
+                subcategory=subcategory, alias=alias)
     return functions
 
 
@@ -98,7 +117,7 @@ def decode_param(name, info):
             result['array_retained'] = True
         else:
             result['array_retained'] = False
-    return result
+    return records.SpecParam(result)
 
 
 def parse_signature(sig):
@@ -0,0 +1,249 @@
+# Export of the loaded tables into a SQLite database, plus a few
+# queries over it.
+#
+# To create a database:
+#
+#     python sqlite_store.py registry.db
+#
+# Then e.g.:
+#
+#     conn = sqlite_store.connect('registry.db')
+#     sqlite_store.find_inconsistent_functions(conn, 'es2', 'EXT_')
+#
+# Tables:
+# - functions: one row per function known to each source ('mesa' or
+#   'opengl').  Columns that don't apply to a source are NULL.
+# - params: one row per function parameter, in order.
+# - alias_sets: one row per alias set of each source, with the
+#   aggregated properties documented in mesa.py (NULL for opengl, which
+#   has no such properties).
+# - extension_functions: one row per (extension, function) pair of
+#   each source ('mesa', 'opengl' or 'extensions').
+# - dispatch: one row per function that api_exec.c installs in the
+#   dispatch table, with the conditions under which it does so.
+
+import api_exec
+import extensions
+import mesa
+import opengl
+import os
+import sqlite3
+import sys
+
+
+SCHEMA = """
+CREATE TABLE functions (
+    source TEXT NOT NULL,
+    name TEXT NOT NULL,
+    category TEXT,
+    return_type TEXT NOT NULL,
+    alias TEXT,
+    alias_canonical_name TEXT,
+    deprecated TEXT,
+    es1 TEXT,
+    es2 TEXT,
+    exec TEXT,
+    desktop INTEGER,
+    mesa_name TEXT,
+    dispatch_offset TEXT,
+    PRIMARY KEY (source, name));
+CREATE INDEX functions_by_name ON functions (name);
+CREATE INDEX functions_by_category ON functions (category);
+CREATE INDEX functions_by_alias_canonical_name
+    ON functions (source, alias_canonical_name);
+
+CREATE TABLE params (
+    source TEXT NOT NULL,
+    function TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    name TEXT NOT NULL,
+    type TEXT NOT NULL,
+    PRIMARY KEY (source, function, position));
+
+CREATE TABLE alias_sets (
+    source TEXT NOT NULL,
+    canonical_name TEXT NOT NULL,
+    deprecated TEXT,
+    es1 TEXT,
+    es2 TEXT,
+    exec TEXT,
+    desktop INTEGER,
+    mesa_name TEXT,
+    dispatch_offset TEXT,
+    PRIMARY KEY (source, canonical_name));
+
+CREATE TABLE extension_functions (
+    source TEXT NOT NULL,
+    extension TEXT NOT NULL,
+    function TEXT NOT NULL);
+CREATE INDEX extension_functions_by_extension
+    ON extension_functions (source, extension);
+CREATE INDEX extension_functions_by_function
+    ON extension_functions (source, function);
+
+CREATE TABLE dispatch (
+    name TEXT PRIMARY KEY,
+    mesa_function TEXT NOT NULL,
+    desktop INTEGER NOT NULL,
+    deprecated TEXT,
+    es1 INTEGER NOT NULL,
+    es2 TEXT);
+CREATE INDEX dispatch_by_mesa_function ON dispatch (mesa_function);
+"""
+
+
+# Map from the column names shared by the functions and alias_sets
+# tables to the corresponding keys in the mesa.py tables.
+MESA_COLUMNS = (('deprecated', 'deprecated'), ('es1', 'es1'), ('es2', 'es2'),
+                ('exec', 'exec'), ('desktop', 'desktop'),
+                ('mesa_name', 'mesa_name'), ('dispatch_offset', 'offset'))
+
+
+def export_functions(conn, source, functions, alias_sets_by_function):
+    columns = ['source', 'name', 'category', 'return_type', 'alias',
+               'alias_canonical_name']
+    columns.extend(column for column, key in MESA_COLUMNS)
+    function_rows = []
+    param_rows = []
+    for name, func in functions.items():
+        row = [source, name, func.get('category'), func['return'],
+               func['alias'], alias_sets_by_function[name]['canonical_name']]
+        row.extend(func.get(key) for column, key in MESA_COLUMNS)
+        function_rows.append(row)
+        for i, param in enumerate(func['params']):
+            param_rows.append((source, name, i, param['name'], param['type']))
+    conn.executemany(
+        'INSERT INTO functions ({0}) VALUES ({1})'.format(
+            ', '.join(columns), ', '.join('?' for c in columns)),
+        function_rows)
+    conn.executemany('INSERT INTO params VALUES (?, ?, ?, ?, ?)', param_rows)
+
+
+def export_alias_sets(conn, source, alias_sets):
+    columns = ['source', 'canonical_name']
+    columns.extend(column for column, key in MESA_COLUMNS)
+    rows = []
+    for alias_set in alias_sets:
+        row = [source, alias_set['canonical_name']]
+        row.extend(alias_set.get(key) for column, key in MESA_COLUMNS)
+        rows.append(row)
+    conn.executemany(
+        'INSERT INTO alias_sets ({0}) VALUES ({1})'.format(
+            ', '.join(columns), ', '.join('?' for c in columns)),
+        rows)
+
+
+def export_functions_by_extension(conn, source, functions_by_extension):
+    conn.executemany(
+        'INSERT INTO extension_functions VALUES (?, ?, ?)',
+        ((source, ext, func)
+         for ext, funcs in functions_by_extension.items()
+         for func in funcs))
+
+
+def export_dispatch(conn, functions):
+    conn.executemany(
+        'INSERT INTO dispatch VALUES (?, ?, ?, ?, ?, ?)',
+        ((name, func['mesa_function'], func['condition']['desktop'],
+          func['condition']['deprecated'], func['condition']['es1'],
+          func['condition']['es2'])
+         for name, func in functions.items()))
+
+
+def export(db_filename):
+    """Create (or replace) the database db_filename, loading every
+    source.
+    """
+    if os.path.exists(db_filename):
+        os.remove(db_filename)
+    conn = sqlite3.connect(db_filename)
+    with conn:
+        conn.executescript(SCHEMA)
+        for source, module in (('mesa', mesa), ('opengl', opengl)):
+            export_functions(conn, source, module.FUNCTIONS,
+                             module.ALIAS_SETS_BY_FUNCTION)
+            export_alias_sets(conn, source, module.ALIAS_SETS)
+            export_functions_by_extension(conn, source,
+                                          module.FUNCTIONS_BY_EXTENSION)
+        export_functions_by_extension(conn, 'extensions',
+                                      extensions.FUNCTIONS_BY_EXTENSION)
+        export_dispatch(conn, api_exec.FUNCTIONS)
+    conn.close()
+
+
+# Sources for which the functions table has the es1 and es2 columns,
+# and the alias_sets table the aggregated properties.
+SOURCES_WITH_API_PROPERTIES = ('mesa',)
+
+
+def connect(db_filename):
+    conn = sqlite3.connect(db_filename)
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+# Return the smallest string greater than every string that starts with
+# prefix, so that "column >= prefix AND column < bound" is a prefix
+# match that can use an index on column (which substr() and LIKE, with
+# the default collation, can't).
+def prefix_upper_bound(prefix):
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def find_inconsistent_functions(conn, api, extension_prefix, source='mesa'):
+    """Return the sorted names of the functions available in the given
+    API ('es1' or 'es2'), defined by an extension whose name starts
+    with extension_prefix, and whose alias set has an inconsistent
+    property.  Only sources in SOURCES_WITH_API_PROPERTIES have the
+    properties this needs.
+    """
+    assert api in ('es1', 'es2')
+    if source not in SOURCES_WITH_API_PROPERTIES:
+        raise Exception('Source {0!r} has no API or alias set properties'
+                        .format(source))
+    if extension_prefix:
+        extension_condition = 'e.extension >= ? AND e.extension < ?'
+        params = (source, extension_prefix,
+                  prefix_upper_bound(extension_prefix))
+    else:
+        extension_condition = '1'
+        params = (source,)
+    cursor = conn.execute(
+        """SELECT DISTINCT f.name FROM functions f
+           JOIN extension_functions e
+               ON e.source = f.source AND e.function = f.name
+           JOIN alias_sets a
+               ON a.source = f.source
+                   AND a.canonical_name = f.alias_canonical_name
+           WHERE f.source = ? AND f.{0} IS NOT NULL
+               AND {1}
+               AND 'inconsistent' IN (a.deprecated, a.es1, a.exec)
+           ORDER BY f.name""".format(api, extension_condition),
+        params)
+    return [row[0] for row in cursor]
+
+
+def find_extensions_defining(conn, function, source='mesa'):
+    """Return the sorted names of the extensions that define function."""
+    cursor = conn.execute(
+        """SELECT extension FROM extension_functions
+           WHERE source = ? AND function = ? ORDER BY extension""",
+        (source, function))
+    return [row[0] for row in cursor]
+
+
+def find_functions_dispatched_to(conn, mesa_function):
+    """Return the sorted names of the GL functions that api_exec.c
+    dispatches to mesa_function.
+    """
+    cursor = conn.execute(
+        'SELECT name FROM dispatch WHERE mesa_function = ? ORDER BY name',
+        (mesa_function,))
+    return [row[0] for row in cursor]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 2:
+        print('Usage: {0} OUTPUT'.format(sys.argv[0]), file=sys.stderr)
+        sys.exit(1)
+    export(sys.argv[1])
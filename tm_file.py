@@ -1,9 +1,16 @@
 # Code for parsing a tm file (e.g. the gl.tm file published by OpenGL)
 
 import hashcomments
+import parse_cache
 
 # Return a map from abstract type name to C type.
 def parse_type_map(filename):
+    version = parse_cache.source_version(__file__, hashcomments.__file__)
+    return parse_cache.cached(filename, 'tm_file', version,
+                              lambda: read_type_map(filename))
+
+# Same as parse_type_map(), but bypassing the cache.
+def read_type_map(filename):
     type_map = {}
     with open(filename, 'r') as f:
         for line in hashcomments.filter_out_comments(f):